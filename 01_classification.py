@@ -1,16 +1,17 @@
 import streamlit as st
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_anthropic import ChatAnthropic
+from llm_clients import get_api_key, get_llm
+from llm_json import LLMJSONError, classification_schema, parse_llm_json
 import json
 import os
 import base64
 import PyPDF2
 
 # Initialize Claude
-llm = ChatAnthropic(
+llm = get_llm(
     model="claude-3-sonnet-20240229",
-    anthropic_api_key=st.secrets["ANTHROPIC_API_KEY"]
+    api_key=get_api_key()
 )
 
 CATEGORIES = {
@@ -30,6 +31,13 @@ CATEGORIES = {
     "Unclear": "Any document that does not meet the above categories"
 }
 
+# Every key display_results shows must be present
+CLASSIFICATION_SCHEMA = classification_schema(CATEGORIES)
+CLASSIFICATION_SCHEMA["required"] += ["PII", "sentiment", "human", "archive_duration", "deletion_date",
+                                      "category_analysis", "key_indicators", "archive", "alternative_categories"]
+CLASSIFICATION_SCHEMA["properties"]["key_indicators"] = {"type": "array", "items": {"type": "string"}}
+CLASSIFICATION_SCHEMA["properties"]["alternative_categories"] = {"type": "string"}  # the prompt asks for prose
+
 def process_pdf(file):
     pdf_reader = PyPDF2.PdfReader(file)
     return pdf_reader.pages[0].extract_text()[:2000]
@@ -101,9 +109,8 @@ def classify_document(text):
     """
     response = llm.invoke(prompt)
     try:
-        json_str = response.content[response.content.find('{'):response.content.rfind('}')+1]
-        return json.loads(json_str)
-    except:
+        return parse_llm_json(llm, response.content, CLASSIFICATION_SCHEMA)
+    except LLMJSONError:
         return None
 
 def display_results(classification):
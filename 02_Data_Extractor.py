@@ -1,29 +1,76 @@
 import streamlit as st
-from langchain_anthropic import ChatAnthropic
-import json
+from llm_clients import get_api_key, get_llm
 import os
 import base64
-import PyPDF2
-import re
+from pdf_extraction import extract_pages
+from invoice_rules import extract_invoice_fields, merge_extractions, rules_are_complete
+from invoice_validation import apply_corrections, fields_to_recheck, validate_amounts
+from llm_json import LLMJSONError, chunk_text, invoke_json, parse_llm_json
 
 # Initialize Claude
-llm = ChatAnthropic(
+llm = get_llm(
     model="claude-3-sonnet-20240229",
-    anthropic_api_key=st.secrets["ANTHROPIC_API_KEY"]
+    api_key=get_api_key()
 )
 
+SKIP_LLM_WHEN_COMPLETE = True  # invoices whose booking fields the rules fully cover are not sent to Claude
+RULES_ONLY_NOTE = "All booking fields were extracted by rules; vendor, customer and line items were not requested."
+# Fields requested from Claude unless the rules already found them (keys as in the rule results)
+PROMPT_FIELDS = {
+    "Invoice Number": "Invoice number (Rechnungsnummer)",
+    "Invoice Date": "Invoice date (Rechnungsdatum)",
+    "Order Number": "Order number (Bestellnummer)",
+    "Vendor": "Vendor name and address",
+    "Customer": "Customer name and address",
+    "VAT ID": "VAT ID (USt-IDNr)",
+    "Payment Reference": "Payment reference (Zahlungsreferenz)",
+    "line_items": "Line items with prices",
+    "tax_amount": "Tax amounts (USt/MwSt)",
+    "total_amount": "Total amount",
+}
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "document_type": {"type": "string"},
+        "extracted_fields": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["field_name", "value"],
+                "properties": {"field_name": {"type": "string"}, "value": {"type": "string"}},
+            },
+        },
+        "amounts": {"type": "object"},
+        "line_items": {"type": "array", "items": {"type": "object"}},
+    },
+}
+CORRECTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {"amounts": {"type": "object"}, "line_items": {"type": "array", "items": {"type": "object"}}},
+}
+
 def process_pdf(file):
     try:
-        pdf_reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        return "".join(page_text + "\n" for page_text in extract_pages(file))
     except Exception as e:
         st.error(f"Error processing PDF: {str(e)}")
         return None
 
-def extract_document_info(text):
+def extract_document_info(text, on_partial=None):
+    """
+    Extract invoice fields: strictly formatted fields (numbers, dates, VAT ID, IBAN, amounts) by
+    local rules, the rest by Claude, whose prompt lists only the fields the rules did not find.
+    With on_partial, Claude's answer is streamed and on_partial is called with each partial result.
+    """
+    rules = extract_invoice_fields(text)
+    if SKIP_LLM_WHEN_COMPLETE and rules_are_complete(rules):
+        return validate_extraction(text, merge_extractions(rules, {"validation_warnings": [RULES_ONLY_NOTE]}))
+    # Fields and amounts under a generic label ("Datum", "Netto") are asked for again; Claude's value replaces them in the merge
+    found = {field["field_name"] for field in rules["extracted_fields"] if field["confidence"] == "high"}
+    found |= {key for key in rules["amounts"] if rules["amount_confidence"].get(key) != "medium"}
+    residual_fields = "\n    ".join(f"- {line}" for name, line in PROMPT_FIELDS.items() if name not in found)
+    already_extracted = ", ".join(sorted(found)) or "none"
+
     prompt = f"""
     You are a document analysis expert. Analyze this document and extract structured information.
     The document is in German or English - handle both languages.
@@ -31,16 +78,9 @@ def extract_document_info(text):
     IMPORTANT: Your response must be ONLY valid JSON without any additional text or explanation.
     
     Extract these fields if present:
-    - Invoice number (Rechnungsnummer)
-    - Invoice date (Rechnungsdatum)
-    - Order number (Bestellnummer)
-    - Vendor name and address
-    - Customer name and address
-    - VAT ID (USt-IDNr)
-    - Payment reference (Zahlungsreferenz)
-    - Line items with prices
-    - Tax amounts (USt/MwSt)
-    - Total amount
+    {residual_fields}
+    
+    Already extracted, do not return these: {already_extracted}
     
     Respond with this exact JSON structure:
     {{
@@ -66,43 +106,74 @@ def extract_document_info(text):
                 "unit_price_net": "price before tax",
                 "total_price": "total price"
             }}
-        ],
-        "validation_warnings": []
+        ]
     }}
 
     Analyze this text: {text}
     """
     
     try:
-        response = llm.invoke(prompt)
-        
-        # Try to find JSON in the response
-        json_match = re.search(r'\{.*\}', response.content, re.DOTALL)
-        if json_match:
-            json_str = json_match.group()
-            return json.loads(json_str)
-        else:
-            st.error("No valid JSON found in response")
-            return None
+        llm_result, _ = invoke_json(llm, prompt, EXTRACTION_SCHEMA, on_partial)
+        return validate_extraction(text, merge_extractions(rules, llm_result))
             
-    except json.JSONDecodeError as e:
+    except LLMJSONError as e:
         st.error(f"JSON parsing error: {str(e)}")
-        st.write("Raw response:", response.content)
+        st.write("Raw response:", e.raw)
         return None
     except Exception as e:
         st.error(f"Extraction error: {str(e)}")
         return None
 
-def display_field_with_confidence(label, original_label, value, confidence):
+def validate_extraction(text, extraction):
+    """
+    Check amounts and line items locally. Only the fields failing a check go back to Claude,
+    in one small follow-up call; whatever still fails becomes a validation warning.
+    """
+    issues = validate_amounts(extraction)
+    fields = fields_to_recheck(issues)
+    if fields:
+        corrections = reextract_fields(text, issues, fields)
+        if corrections:
+            apply_corrections(extraction, corrections, fields)
+            issues = validate_amounts(extraction)
+    extraction["validation_warnings"] = extraction.get("validation_warnings", []) + [issue["message"] for issue in issues]
+    return extraction
+
+def reextract_fields(text, issues, fields):
+    problems = "\n    ".join(f"- {issue['message']}" for issue in issues if issue["recheck"])
+    prompt = f"""
+    You are checking values extracted from an invoice. These checks failed:
+    {problems}
+    
+    Re-read the invoice and return ONLY valid JSON with the correct values of these fields, exactly as printed:
+    {", ".join(fields)}
+    
+    Use this structure and include only the fields listed above (line item indexes start at 0):
+    {{
+        "amounts": {{"net_amount": "...", "tax_amount": "...", "total_amount": "..."}},
+        "line_items": [{{"index": 0, "quantity": "...", "unit_price_net": "...", "total_price": "..."}}]
+    }}
+    
+    Invoice text: {text}
+    """
+    
+    try:
+        return parse_llm_json(llm, chunk_text(llm.invoke(prompt)), CORRECTIONS_SCHEMA)
+    except Exception as e:
+        st.warning(f"Re-checking amounts failed: {str(e)}")
+        return None
+
+def display_field_with_confidence(label, original_label, value, confidence, source=None):
     confidence_colors = {
         "high": "#00ff00",
         "medium": "#ffff00",
         "low": "#ff0000"
     }
+    source_note = f" · {source}" if source else ""
     
     html = f"""
         <div style="margin-bottom: 1rem; padding: 8px; border-radius: 4px; background-color: #f0f2f6;">
-            <span style="font-size: 0.9rem; color: #666;">{original_label}</span><br>
+            <span style="font-size: 0.9rem; color: #666;">{original_label}{source_note}</span><br>
             <span style="font-weight: bold;">{label}:</span>
             <span style="margin-left: 5px;">{value}</span>
             <span style="
@@ -110,7 +181,7 @@ def display_field_with_confidence(label, original_label, value, confidence):
                 width: 10px;
                 height: 10px;
                 border-radius: 50%;
-                background-color: {confidence_colors[confidence.lower()]};
+                background-color: {confidence_colors.get(str(confidence).lower(), confidence_colors['low'])};
                 margin-left: 5px;
                 animation: blink 1s ease-in-out infinite;
             "></span>
@@ -130,24 +201,25 @@ def display_results(extraction):
     
     with col1:
         st.markdown("### Document Information")
-        st.markdown(f"**Document Type:** {extraction['document_type']}")
+        st.markdown(f"**Document Type:** {extraction.get('document_type', '')}")
         
         st.markdown("### Key Fields")
         for field in extraction['extracted_fields']:
             display_field_with_confidence(
                 field['field_name'],
-                field['original_label'],
+                field.get('original_label', ''),
                 field['value'],
-                field['confidence']
+                field.get('confidence', 'low'),
+                field.get('source')
             )
         
         if 'amounts' in extraction:
             st.markdown("### Amounts")
             st.markdown(f"""
-                * Net Amount: {extraction['amounts']['net_amount']}
-                * Tax Amount: {extraction['amounts']['tax_amount']}
-                * Total Amount: {extraction['amounts']['total_amount']}
-                * Currency: {extraction['amounts']['currency']}
+                * Net Amount: {extraction['amounts'].get('net_amount', '')}
+                * Tax Amount: {extraction['amounts'].get('tax_amount', '')}
+                * Total Amount: {extraction['amounts'].get('total_amount', '')}
+                * Currency: {extraction['amounts'].get('currency', '')}
             """)
     
     with col2:
@@ -155,10 +227,10 @@ def display_results(extraction):
             st.markdown("### Line Items")
             for item in extraction['line_items']:
                 st.markdown(f"""
-                * **{item['description']}**
-                  - Quantity: {item['quantity']}
-                  - Unit Price (Net): {item['unit_price_net']}
-                  - Total Price: {item['total_price']}
+                * **{item.get('description', '')}**
+                  - Quantity: {item.get('quantity', '')}
+                  - Unit Price (Net): {item.get('unit_price_net', '')}
+                  - Total Price: {item.get('total_price', '')}
                 """)
         
         if 'validation_warnings' in extraction and extraction['validation_warnings']:
@@ -166,6 +238,18 @@ def display_results(extraction):
             for warning in extraction['validation_warnings']:
                 st.warning(warning)
 
+def display_partial_extraction(placeholder, partial):
+    """Show the fields Claude has streamed so far, until the full results replace them"""
+    if not isinstance(partial, dict):
+        return
+    with placeholder.container():
+        st.caption("Extracting...")
+        for field in partial.get("extracted_fields") or []:
+            if isinstance(field, dict) and field.get("field_name") and field.get("value"):
+                st.markdown(f"**{field['field_name']}:** {field['value']}")
+        for key, value in (partial.get("amounts") or {}).items():
+            st.markdown(f"**{key.replace('_', ' ').capitalize()}:** {value}")
+
 def main():
     st.set_page_config(layout="wide", page_title="Document Information Extraction")
     
@@ -177,7 +261,11 @@ def main():
         with st.spinner("Processing document..."):
             text = process_pdf(uploaded_file)
             if text:
-                extraction = extract_document_info(text)
+                placeholder = st.empty()
+                extraction = extract_document_info(
+                    text, on_partial=lambda partial: display_partial_extraction(placeholder, partial)
+                )
+                placeholder.empty()
                 if extraction:
                     display_results(extraction)
 
@@ -1,26 +1,32 @@
 import streamlit as st
-from langchain_anthropic import ChatAnthropic
+from llm_clients import get_api_key, get_llm
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import PyPDF2
+from pdf_extraction import extract_pages
+from llm_json import LLMJSONError, parse_json
 from typing import List, Dict
-import json
 
-llm = ChatAnthropic(
+MAX_CONCURRENT_REQUESTS = 8  # chunk summaries in flight at once
+REQUESTS_PER_SECOND = 4
+REDUCE_TOKEN_BUDGET = 12000  # input tokens allowed for a single combine call
+CHARS_PER_TOKEN = 4  # rough estimate, good enough for sizing groups
+TOPICS_SCHEMA = {"type": "array", "items": {"type": "string"}}
+
+llm = get_llm(
     model="claude-3-sonnet-20240229",
-    anthropic_api_key=st.secrets["ANTHROPIC_API_KEY"]
+    api_key=get_api_key(),
+    requests_per_second=REQUESTS_PER_SECOND,
+    max_bucket_size=MAX_CONCURRENT_REQUESTS
 )
 
 def extract_text(uploaded_file, page_range=None):
-    pdf_reader = PyPDF2.PdfReader(uploaded_file)
-    total_pages = len(pdf_reader.pages)
-    
     if page_range:
         start, end = page_range
-        pages = range(start-1, min(end, total_pages))
+        pages = extract_pages(uploaded_file, start-1, end)
     else:
-        pages = range(total_pages)
+        pages = extract_pages(uploaded_file)
     
-    return " ".join(pdf_reader.pages[i].extract_text() for i in pages)
+    return " ".join(pages)
 
 def chunk_text(text: str) -> List[str]:
     splitter = RecursiveCharacterTextSplitter(
@@ -36,10 +42,34 @@ def extract_topics(text: str) -> List[str]:
     """
     response = llm.invoke(prompt)
     try:
-        return json.loads(response.content)
-    except:
+        return parse_json(response.content, TOPICS_SCHEMA)
+    except LLMJSONError:
         return []
 
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def reduce_summaries(summaries: List[str], style: str, token_budget: int = REDUCE_TOKEN_BUDGET) -> str:
+    """
+    Tree-reduce summaries: merge them in parallel groups sized to fit the token budget,
+    level by level, until one group fits into a single final combine call.
+    """
+    combine_prompt = f"Combine these summaries into a single coherent {style} summary:\n"
+    while True:
+        largest = max((estimate_tokens(summary) for summary in summaries), default=1)
+        group_size = max(2, (token_budget - estimate_tokens(combine_prompt)) // largest)
+        if len(summaries) <= group_size:
+            return llm.invoke(combine_prompt + "\n".join(summaries)).content
+
+        groups = [summaries[i:i + group_size] for i in range(0, len(summaries), group_size)]
+        merge_groups = [group for group in groups if len(group) > 1]
+        responses = iter(llm.batch(
+            [combine_prompt + "\n".join(group) for group in merge_groups],
+            config={"max_concurrency": MAX_CONCURRENT_REQUESTS}
+        ))
+        # A trailing single summary has nothing to merge with and moves up a level unchanged
+        summaries = [next(responses).content if len(group) > 1 else group[0] for group in groups]
+
 def get_summary(text: str, style: str, max_words: int, focus: str) -> str:
     chunks = chunk_text(text)
     
@@ -49,14 +79,14 @@ def get_summary(text: str, style: str, max_words: int, focus: str) -> str:
         "bullet": f"Create a bullet-point summary with {max_words} words focusing on {focus}. Format as '• point' with clear hierarchy."
     }
     
-    summaries = []
-    for chunk in chunks:
-        response = llm.invoke(summary_prompts[style] + f"\nText: {chunk}")
-        summaries.append(response.content)
+    # Summarize chunks concurrently; batch() returns responses in chunk order
+    responses = llm.batch(
+        [summary_prompts[style] + f"\nText: {chunk}" for chunk in chunks],
+        config={"max_concurrency": MAX_CONCURRENT_REQUESTS}
+    )
+    summaries = [response.content for response in responses]
     
-    final_prompt = f"Combine these summaries into a single coherent {style} summary:\n" + "\n".join(summaries)
-    final_response = llm.invoke(final_prompt)
-    return final_response.content
+    return reduce_summaries(summaries, style)
 
 def main():
     st.title("Enhanced Document Summarization")
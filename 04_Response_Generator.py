@@ -1,14 +1,14 @@
 import streamlit as st
-from langchain_anthropic import ChatAnthropic
-import json
-import PyPDF2
+from llm_clients import get_api_key, get_llm
+from pdf_extraction import extract_pages
 from datetime import datetime
-import re
+import hashlib
+from llm_json import LLMJSONError, invoke_json, parse_llm_json
 
 # Initialize Claude
-llm = ChatAnthropic(
+llm = get_llm(
     model="claude-3-sonnet-20240229",
-    anthropic_api_key=st.secrets["ANTHROPIC_API_KEY"]
+    api_key=get_api_key()
 )
 
 RESPONSE_TYPES = {
@@ -21,13 +21,43 @@ RESPONSE_TYPES = {
     "Counter Proposal": "Alternative suggestion to the original request"
 }
 
+LETTER_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "required": ["sender", "letter_details", "content_analysis", "recommended_response_types"],
+    "properties": {
+        "sender": {"type": "object", "required": ["name", "organization", "address"]},
+        "letter_details": {"type": "object", "required": ["subject", "date", "reference_number"]},
+        "content_analysis": {
+            "type": "object",
+            "required": ["main_request", "key_points", "urgency_level"],
+            "properties": {"key_points": {"type": "array"}},
+        },
+        "recommended_response_types": {"type": "array", "items": {"type": "string"}},
+    },
+}
+LETTER_RESPONSE_SCHEMA = {
+    "type": "object",
+    "required": ["subject", "body"],
+    "properties": {"subject": {"type": "string"}, "body": {"type": "string"}},
+}
+
+def memoized_stage(name, key, compute):
+    """
+    Return the output of a pipeline stage, recomputing it only when its key changes.
+    Outputs are kept in st.session_state, so the reruns triggered by widget changes reuse
+    them instead of extracting and analyzing the letter again. Failed stages (None) are retried.
+    """
+    cached = st.session_state.get(name)
+    if cached is not None and cached["key"] == key:
+        return cached["value"]
+    value = compute()
+    if value is not None:
+        st.session_state[name] = {"key": key, "value": value}
+    return value
+
 def process_pdf(file):
     try:
-        pdf_reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        return "".join(page_text + "\n" for page_text in extract_pages(file))
     except Exception as e:
         st.error(f"Error processing PDF: {str(e)}")
         return None
@@ -71,18 +101,13 @@ def analyze_letter(text):
     
     try:
         response = llm.invoke(prompt)
-        # Find JSON in the response using regex
-        json_match = re.search(r'\{[\s\S]*\}', response.content)
-        if json_match:
-            json_str = json_match.group()
-            return json.loads(json_str)
-        else:
-            st.error("No valid JSON found in response")
-            st.write("Raw response:", response.content)
-            return None
+        return parse_llm_json(llm, response.content, LETTER_ANALYSIS_SCHEMA)
+    except LLMJSONError as e:
+        st.error(f"Error analyzing letter: {str(e)}")
+        st.write("Raw response:", e.raw)
+        return None
     except Exception as e:
         st.error(f"Error analyzing letter: {str(e)}")
-        st.write("Raw response:", response.content)
         return None
 
 # Previous imports and functions remain the same until generate_response
@@ -125,7 +150,6 @@ Germany"""
 
     # Clean up the body text
     body = response_data['body']
-    body = body.replace('nn', '\n')  # Fix incorrect line breaks
     body = body.replace('  ', ' ')   # Fix double spaces
     
     # Signature block
@@ -169,7 +193,6 @@ Frankfurt Am Main
     subject = response_data['subject']
 
     body = response_data['body']
-    body = body.replace('nn', '\n')
     body = body.replace('  ', ' ')
 
     signature = """Dr. Maria Weber
@@ -226,7 +249,8 @@ Subject: {subject}
 
 # The rest of the code remains the same, just update the display_letter_format function
 
-def generate_response(analysis, response_type, channel):
+def generate_response(analysis, response_type, channel, on_partial=None):
+    """Generate the response letter; with on_partial, the letter is streamed and on_partial gets each partial result"""
     company_details = {
         "name": "Nestle Deutschland AG",
         "address": "Lyoner Str 23\nFrankfurt Am Main\n60528 Germany",
@@ -261,27 +285,11 @@ Return ONLY a JSON object exactly like this:
 Use proper paragraph breaks and formatting."""
 
     try:
-        response = llm.invoke(prompt)
-        
-        # Clean up the response
-        text = response.content.strip()
-        
-        # Extract JSON part
-        start_idx = text.find('{')
-        end_idx = text.rfind('}') + 1
-        if start_idx != -1 and end_idx != -1:
-            json_str = text[start_idx:end_idx]
-            
-            # Clean up the JSON string
-            json_str = json_str.replace('\n', ' ')
-            json_str = json_str.replace('\\n', '\n')
-            json_str = json_str.replace('\\"', '"')
-            
-            try:
-                return json.loads(json_str)
-            except json.JSONDecodeError as e:
-                st.error(f"JSON parsing error: {str(e)}")
-                return None
+        response_data, _ = invoke_json(llm, prompt, LETTER_RESPONSE_SCHEMA, on_partial)
+        return response_data
+    except LLMJSONError as e:
+        st.error(f"JSON parsing error: {str(e)}")
+        return None
     except Exception as e:
         st.error(f"Error: {str(e)}")
         return None
@@ -300,9 +308,13 @@ def main():
         uploaded_file = st.file_uploader("Upload Letter", type="pdf")
         
         if uploaded_file:
-            text = process_pdf(uploaded_file)
+            # Each stage is keyed by the hash of its input: a new upload re-extracts and re-analyzes,
+            # switching response type or channel reuses both
+            file_digest = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+            text = memoized_stage("letter_text", file_digest, lambda: process_pdf(uploaded_file))
             if text and len(text.strip()) > 0:
-                analysis = analyze_letter(text)
+                text_digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                analysis = memoized_stage("letter_analysis", text_digest, lambda: analyze_letter(text))
                 if analysis:
                     st.subheader("Letter Details")
                     st.write(f"**Subject:** {analysis['letter_details']['subject']}")
@@ -333,22 +345,39 @@ def main():
                             ["Letter", "Email"]  # Changed default to Letter
                         )
                         
+                        # Generated responses for this letter, per response type and channel, so they
+                        # stay on screen across reruns and each click costs exactly one generation call
+                        responses = st.session_state.get("letter_responses")
+                        if responses is None or responses["key"] != text_digest:
+                            responses = {"key": text_digest, "value": {}}
+                            st.session_state["letter_responses"] = responses
+                        
                         if st.button("Generate Response"):
-                            st.markdown("---")
                             with st.spinner("Generating response..."):
-                                response_data = generate_response(analysis, response_type, channel)
+                                # Show the letter body as it streams in; the formatted response replaces it
+                                preview = st.empty()
+                                response_data = generate_response(
+                                    analysis, response_type, channel,
+                                    on_partial=lambda partial: preview.text(partial.get("body", "") if isinstance(partial, dict) else "")
+                                )
+                                preview.empty()
                                 if response_data:
-                                    st.header("Generated Response")
-                                    if channel == "Email":
-                                        display_email_format(response_data, analysis)
-                                    else:
-                                        display_letter_format(response_data, analysis)
-                                        st.download_button(
-                                            label="Download Letter",
-                                            data=response_data['body'],
-                                            file_name="response_letter.txt",
-                                            mime="text/plain"
-                                        )
+                                    responses["value"][(response_type, channel)] = response_data
+                        
+                        response_data = responses["value"].get((response_type, channel))
+                        if response_data:
+                            st.markdown("---")
+                            st.header("Generated Response")
+                            if channel == "Email":
+                                display_email_format(response_data, analysis)
+                            else:
+                                display_letter_format(response_data, analysis)
+                                st.download_button(
+                                    label="Download Letter",
+                                    data=response_data['body'],
+                                    file_name="response_letter.txt",
+                                    mime="text/plain"
+                                )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,35 +1,72 @@
 import streamlit as st
-from langchain_anthropic import ChatAnthropic
+from llm_clients import get_api_key, get_llm
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-import PyPDF2
-from typing import List, Dict
+from pdf_extraction import extract_pages
+from typing import List, Dict, Tuple
 import json
 import langdetect
 
-llm = ChatAnthropic(
+CHUNK_SIZE = 4000
+CHUNK_OVERLAP = 200
+MAX_CONCURRENT_REQUESTS = 8  # chunk translations in flight at once
+
+llm = get_llm(
     model="claude-3-sonnet-20240229",
-    anthropic_api_key=st.secrets["ANTHROPIC_API_KEY"]
+    api_key=get_api_key()
 )
 
 def extract_text(uploaded_file, page_range=None):
-    pdf_reader = PyPDF2.PdfReader(uploaded_file)
-    total_pages = len(pdf_reader.pages)
-    
     if page_range:
         start, end = page_range
-        pages = range(start-1, min(end, total_pages))
+        pages = extract_pages(uploaded_file, start-1, end)
     else:
-        pages = range(total_pages)
+        pages = extract_pages(uploaded_file)
     
-    return " ".join(pdf_reader.pages[i].extract_text() for i in pages)
+    return " ".join(pages)
 
 def chunk_text(text: str) -> List[str]:
     splitter = RecursiveCharacterTextSplitter(
-        chunk_size=4000,
-        chunk_overlap=200
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
     )
     return splitter.split_text(text)
 
+def split_translation_segments(text: str) -> List[Tuple[str, str]]:
+    """
+    Split text into (context, segment) pairs using the chunk_text boundaries.
+    Segments tile the text without overlap; the part of a chunk that overlaps the
+    previous one is passed as context only, so the translations can simply be joined.
+    """
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        add_start_index=True
+    )
+    segments = []
+    covered = 0
+    for document in splitter.create_documents([text]):
+        start = document.metadata["start_index"]
+        end = start + len(document.page_content)
+        if end <= covered:
+            continue
+        context = text[start:covered] if start < covered else ""
+        segments.append((context, text[covered:end]))
+        covered = end
+    return segments
+
+def build_translation_prompt(context: str, segment: str, source_lang: str) -> str:
+    context_note = f"""
+        The text continues from the passage below. It is context only, do not translate or repeat it:
+        {context}
+        """ if context else ""
+    return f"""Translate this text from {source_lang} to German. 
+        Maintain the original formatting and structure.
+        {context_note}
+        Only provide the translation, no explanations:
+        
+        {segment.strip()}
+        """
+
 def detect_language(text: str) -> str:
     try:
         return langdetect.detect(text)
@@ -37,28 +74,20 @@ def detect_language(text: str) -> str:
         return "unknown"
 
 def translate_text(text: str, source_lang: str) -> str:
-    chunks = chunk_text(text)
-    translated_chunks = []
+    segments = [(context, segment) for context, segment in split_translation_segments(text) if segment.strip()]
     
-    for chunk in chunks:
-        prompt = f"""Translate this text from {source_lang} to German. 
-        Maintain the original formatting and structure.
-        
-        Only provide the translation, no explanations:
-        
-        {chunk}
-        """
-        response = llm.invoke(prompt)
-        print(response)
-        translated_chunks.append(response.content)
-    
-    # Combine chunks if multiple
-    if len(translated_chunks) > 1:
-        combine_prompt = "Combine these translated segments into one coherent text formatted in markdown:\n" + "\n".join(translated_chunks)
-        final_response = llm.invoke(combine_prompt)
-        return final_response.content
+    # Translate segments concurrently; batch() returns responses in segment order
+    responses = llm.batch(
+        [build_translation_prompt(context, segment, source_lang) for context, segment in segments],
+        config={"max_concurrency": MAX_CONCURRENT_REQUESTS}
+    )
     
-    return translated_chunks[0]
+    # Stitch segments back together, keeping the whitespace that separated them in the original
+    translated = []
+    for (_, segment), response in zip(segments, responses):
+        leading_whitespace = segment[:len(segment) - len(segment.lstrip())]
+        translated.append(leading_whitespace + response.content.strip())
+    return "".join(translated)
 
 def format_as_markdown(text: str) -> str:
     """Convert text to proper markdown format with preserved structure"""
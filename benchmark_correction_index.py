@@ -0,0 +1,73 @@
+import argparse
+import time
+
+import numpy as np
+
+from correction_store import CORRECTIONS_DB, INDEX_KINDS, VECTOR_DIM, build_index, load_stored_vectors
+
+
+def clustered_vectors(size, clusters=200, seed=0):
+    """Synthetic embeddings grouped around topics, closer to real documents than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, VECTOR_DIM)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=size)] + 0.5 * rng.normal(size=(size, VECTOR_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load_vectors(args):
+    if args.from_store:
+        return load_stored_vectors()
+    vectors = clustered_vectors(args.size, seed=args.seed)
+    return np.arange(len(vectors), dtype=np.int64), vectors
+
+
+def benchmark(kind, ids, vectors, queries, truth, k):
+    start = time.perf_counter()
+    index = build_index(kind, ids, vectors)
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        _, found = index.search(query.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(found[0].tolist()) & set(expected.tolist()))
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "kind": kind,
+        "build_s": build_seconds,
+        "recall": hits / (len(queries) * k),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recall@k and search latency of the correction index kinds")
+    parser.add_argument("--size", type=int, default=100000, help="Number of synthetic corrections")
+    parser.add_argument("--from-store", action="store_true", help=f"Use the embeddings stored in {CORRECTIONS_DB}")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--kinds", nargs="+", choices=INDEX_KINDS, default=list(INDEX_KINDS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    ids, vectors = load_vectors(args)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.integers(len(vectors), size=args.queries)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+
+    # Exact neighbours from the flat index are the ground truth for recall
+    _, truth = build_index("flat", ids, vectors).search(queries, args.k)
+
+    print(f"{len(ids)} vectors, {args.queries} queries, recall@{args.k}")
+    print(f"{'index':<8}{'build s':>10}{'recall':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for kind in args.kinds:
+        result = benchmark(kind, ids, vectors, queries, truth, args.k)
+        print(f"{result['kind']:<8}{result['build_s']:>10.2f}{result['recall']:>10.3f}"
+              f"{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-rom langchain_anthropic import ChatAnthropic
+from langchain_anthropic import ChatAnthropic
 import os
 
 llm = ChatAnthropic(
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# Persistent cache for classification results, keyed by document content
+CACHE_DB = "classification_cache.db"
+CACHE_MAX_ENTRIES = 5000
+CACHE_TTL_SECONDS = 30 * 24 * 60 * 60  # 30 days
+
+CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(stat, amount=1):
+    with _stats_lock:
+        CACHE_STATS[stat] += amount
+
+
+def _connect():
+    conn = sqlite3.connect(CACHE_DB, timeout=30)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS classifications (
+            key TEXT PRIMARY KEY,
+            result TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_classifications_last_used ON classifications (last_used)")
+    return conn
+
+
+def make_cache_key(text, prompt_version, model, context=""):
+    """Build the SHA-256 cache key for a document and the prompt/model that classifies it"""
+    digest = hashlib.sha256()
+    for part in (prompt_version, model, context or "", text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_cached_classification(text, prompt_version, model, context=""):
+    """Return a cached classification, or None if it is missing or expired"""
+    key = make_cache_key(text, prompt_version, model, context)
+    now = time.time()
+    try:
+        with _connect() as conn:
+            row = conn.execute(
+                "SELECT result, created_at FROM classifications WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                _count("misses")
+                return None
+            result, created_at = row
+            if now - created_at > CACHE_TTL_SECONDS:
+                conn.execute("DELETE FROM classifications WHERE key = ?", (key,))
+                _count("evictions")
+                _count("misses")
+                return None
+            conn.execute("UPDATE classifications SET last_used = ? WHERE key = ?", (now, key))
+        _count("hits")
+        return json.loads(result)
+    except (sqlite3.Error, ValueError):
+        _count("misses")
+        return None
+
+
+def cache_classification(text, prompt_version, model, result, context=""):
+    """Store a classification result and evict expired and least recently used entries"""
+    if not isinstance(result, dict):
+        return
+    key = make_cache_key(text, prompt_version, model, context)
+    now = time.time()
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO classifications (key, result, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), now, now),
+            )
+            expired = conn.execute(
+                "DELETE FROM classifications WHERE created_at < ?", (now - CACHE_TTL_SECONDS,)
+            ).rowcount
+            overflow = conn.execute(
+                """DELETE FROM classifications WHERE key IN (
+                    SELECT key FROM classifications ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )""",
+                (CACHE_MAX_ENTRIES,),
+            ).rowcount
+        _count("evictions", expired + overflow)
+    except (sqlite3.Error, TypeError, ValueError):
+        pass
+
+
+def get_cache_stats():
+    """Return hit/miss/eviction counters for this process"""
+    with _stats_lock:
+        stats = dict(CACHE_STATS)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
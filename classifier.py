@@ -1,12 +1,28 @@
 import streamlit as st
-from langchain_anthropic import ChatAnthropic
-import pandas as pd
+from llm_clients import get_api_key, get_llm
 import PyPDF2
 import os
-from datetime import datetime
+import io
+import sys
+import json
+import argparse
+import hashlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from classification_cache import get_cached_classification, cache_classification
+from fast_path import classify_locally, fast_path_report
+from near_duplicates import find_near_duplicate, remember_document
+from document_store import file_document
+from feedback_store import save_feedback, save_feedback_batch, import_legacy_csv, export_parquet
+from shared_resources import get_resource
+from llm_json import classification_schema, parse_llm_json
 
 # Constants
-LEARNING_DB = "learning_data.csv"
+LEARNING_DB = "learning_data.csv"  # legacy feedback file, imported once into the feedback store
+FEEDBACK_BATCH_SIZE = 100
+UPLOAD_CONCURRENCY = 8  # uploaded documents classified at once, i.e. Claude requests in flight
+MODEL_NAME = "claude-3-sonnet-20240229"
+PROMPT_VERSION = "classifier-v1"
+CONFIDENCE_THRESHOLD = 0.85
 CATEGORIES = {
     "Finance": "Financial documents, invoices, budgets",
     "Legal": "Contracts, agreements, legal notices",
@@ -16,6 +32,9 @@ CATEGORIES = {
     "IT": "Technical documentation, system specs",
     "General": "Miscellaneous business documents"
 }
+CLASSIFICATION_SCHEMA = classification_schema(CATEGORIES)
+
+import_legacy_csv(LEARNING_DB)
 
 def process_pdf(file):
     """Extract text from PDF file"""
@@ -30,11 +49,30 @@ def process_pdf(file):
         return None
 
 def classify_document(text):
-    """Classify document using Claude"""
+    """
+    Classify a document, reusing the classification of a near-duplicate seen before
+    (mass mailings, spam waves, re-scans) so it is filed in the same folder without a new call.
+    """
+    duplicate = find_near_duplicate(text, PROMPT_VERSION)
+    if duplicate is not None:
+        return {**duplicate["classification"], "source": "near_duplicate", "similarity": duplicate["similarity"]}
+    result = _classify_new_document(text)
+    if result:
+        remember_document(text, PROMPT_VERSION, result)
+    return result
+
+def _classify_new_document(text):
+    """Classify document locally when the match is clear, otherwise using Claude"""
+    local = classify_locally(text, CATEGORIES, use_feedback=True)
+    if local is not None:
+        return local
+    cached = get_cached_classification(text, PROMPT_VERSION, MODEL_NAME)
+    if cached is not None:
+        return cached
     try:
-        llm = ChatAnthropic(
-            model="claude-3-sonnet-20240229",
-            anthropic_api_key=st.secrets["ANTHROPIC_API_KEY"]
+        llm = get_llm(
+            model=MODEL_NAME,
+            api_key=get_api_key()
         )
         
         prompt = f"""You are a document classification expert. Based on the following text, classify it into one of these categories:
@@ -49,7 +87,8 @@ def classify_document(text):
         """
         
         response = llm.invoke(prompt)
-        result = eval(response.content)
+        result = parse_llm_json(llm, response.content, CLASSIFICATION_SCHEMA)
+        cache_classification(text, PROMPT_VERSION, MODEL_NAME, result)
         return result
     except Exception as e:
         st.error(f"Classification error: {str(e)}")
@@ -57,75 +96,275 @@ def classify_document(text):
 
 def save_learning_data(text, predicted_category, confidence, actual_category):
     """Save classification data for learning"""
-    df = pd.DataFrame({
-        'text': [text],
-        'predicted_category': [predicted_category],
-        'confidence': [confidence],
-        'user_feedback': [actual_category],
-        'timestamp': [pd.Timestamp.now()]
-    })
-    
-    if os.path.exists(LEARNING_DB):
-        df.to_csv(LEARNING_DB, mode='a', header=False, index=False)
-    else:
-        df.to_csv(LEARNING_DB, index=False)
+    save_feedback(text, predicted_category, confidence, actual_category)
 
 def store_document(file, category):
-    """Store document in category folder"""
+    """Store document in category folder (a hardlink to its content-addressed blob)"""
     try:
-        folder = f"classified_docs/{category}"
-        os.makedirs(folder, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{file.name}"
-        filepath = os.path.join(folder, filename)
-        with open(filepath, 'wb') as f:
-            f.write(file.getvalue())
+        file_document(file.getvalue(), file.name, category)
         return True
     except Exception as e:
         st.error(f"Error storing document: {str(e)}")
         return False
 
+def _extract_pdf_file(path):
+    """Extract text from a PDF on disk (runs in a worker process)"""
+    with open(path, "rb") as f:
+        return process_pdf(io.BytesIO(f.read()))
+
+def _named_upload(data, name):
+    """Wrap bytes so store_document can treat them like an upload"""
+    upload = io.BytesIO(data)
+    upload.name = name
+    return upload
+
+def _load_upload(path):
+    """Wrap a file on disk so store_document can treat it like an upload"""
+    with open(path, "rb") as f:
+        return _named_upload(f.read(), os.path.basename(path))
+
+def _save_batch_feedback(rows):
+    """Save batch feedback; a failed write loses these rows, not the rest of the batch"""
+    try:
+        save_feedback_batch(rows)
+    except Exception as e:
+        print(f"Error saving feedback for {len(rows)} documents: {e}", file=sys.stderr)
+
+def run_batch(directory, output, workers=None, llm_concurrency=8, min_confidence=CONFIDENCE_THRESHOLD):
+    """Classify every PDF below a directory and write one JSON result per line"""
+    pdf_paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names
+        if name.lower().endswith(".pdf")
+    )
+    counts = {"stored": 0, "needs_review": 0, "failed": 0}
+    feedback_rows = []
+
+    with ProcessPoolExecutor(max_workers=workers) as extract_pool, \
+            ThreadPoolExecutor(max_workers=llm_concurrency) as llm_pool, \
+            open(output, "a", encoding="utf-8") as out:
+        extractions = {extract_pool.submit(_extract_pdf_file, path): path for path in pdf_paths}
+        classifications = {}
+        texts = {}
+
+        for future in as_completed(extractions):
+            path = extractions[future]
+            try:
+                text = future.result()
+            except Exception as e:
+                text = None
+                print(f"Error processing {path}: {e}", file=sys.stderr)
+            if not text:
+                counts["failed"] += 1
+                out.write(json.dumps({"file": path, "status": "extraction_failed"}) + "\n")
+                continue
+            texts[path] = text
+            classifications[llm_pool.submit(classify_document, text)] = path
+
+        for future in as_completed(classifications):
+            path = classifications[future]
+            text = texts.pop(path)
+            try:
+                classification = future.result()
+            except Exception as e:  # e.g. a locked store; one document must not end the batch
+                classification = None
+                print(f"Error classifying {path}: {e}", file=sys.stderr)
+            result = {"file": path}
+            if not classification:
+                counts["failed"] += 1
+                result["status"] = "classification_failed"
+            else:
+                category = classification["category"]
+                confidence = classification["confidence"]
+                result.update(category=category, confidence=confidence)
+                if confidence >= min_confidence and store_document(_load_upload(path), category):
+                    if "source" not in classification:  # local and reused answers are not new evidence
+                        feedback_rows.append((text, category, confidence, category))
+                        if len(feedback_rows) >= FEEDBACK_BATCH_SIZE:
+                            _save_batch_feedback(feedback_rows)
+                            feedback_rows = []
+                    counts["stored"] += 1
+                    result["status"] = "stored"
+                else:
+                    counts["needs_review"] += 1
+                    result["status"] = "needs_review"
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+
+    _save_batch_feedback(feedback_rows)
+
+    print(f"Processed {len(pdf_paths)} documents: {counts['stored']} stored, "
+          f"{counts['needs_review']} need review, {counts['failed']} failed. Results in {output}")
+    return counts
+
+def print_fast_path_report(report):
+    print(f"Feedback examples: {report['train']} train, {report['calibration']} calibration, {report['test']} test")
+    if not report["rows"]:
+        print("Not enough feedback to evaluate the local pre-classifier.")
+        return
+    print(f"Temperature {report['temperature']:.3f}, top-1 accuracy on test {report['overall_accuracy']:.1%}")
+    print(f"{'threshold':>10}{'local':>10}{'accuracy':>10}")
+    for row in report["rows"]:
+        accuracy = "-" if row["local_accuracy"] is None else f"{row['local_accuracy']:.1%}"
+        print(f"{row['threshold']:>10.2f}{row['local_ratio']:>10.1%}{accuracy:>10}")
+
+def batch_main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m classifier", description="Headless document classification")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    batch = subparsers.add_parser("batch", help="Classify and file every PDF in a directory")
+    batch.add_argument("directory", help="Directory to scan for PDF files")
+    batch.add_argument("--output", default="classification_results.jsonl", help="JSONL file to append results to")
+    batch.add_argument("--workers", type=int, default=None, help="Processes used for PDF text extraction")
+    batch.add_argument("--llm-concurrency", type=int, default=8, help="Maximum concurrent Claude requests")
+    batch.add_argument("--min-confidence", type=float, default=CONFIDENCE_THRESHOLD,
+                       help="Documents below this confidence are not filed and are marked for review")
+    subparsers.add_parser("fast-path-report",
+                          help="Routing ratio and accuracy of the local pre-classifier on held-out feedback")
+    export = subparsers.add_parser("export-feedback", help="Export the feedback store to Parquet for analytics")
+    export.add_argument("path", help="Parquet file to write")
+    args = parser.parse_args(argv)
+
+    if args.command == "fast-path-report":
+        print_fast_path_report(fast_path_report(CATEGORIES, use_feedback=True))
+        return 0
+    if args.command == "export-feedback":
+        print(f"Exported {export_parquet(args.path)} feedback rows to {args.path}")
+        return 0
+    counts = run_batch(args.directory, args.output, args.workers, args.llm_concurrency, args.min_confidence)
+    return 1 if counts["failed"] else 0
+
+def classify_upload(data, name):
+    """Classify one uploaded PDF and file it when the classification is confident (runs on the upload pool)"""
+    text = process_pdf(io.BytesIO(data))
+    if not text:
+        return {"status": "extraction_failed"}
+    classification = classify_document(text)
+    if not classification:
+        return {"status": "classification_failed"}
+    category = classification["category"]
+    confidence = classification["confidence"]
+    result = {"text": text, "category": category, "confidence": confidence, "source": classification.get("source", "llm")}
+    if confidence >= CONFIDENCE_THRESHOLD and store_document(_named_upload(data, name), category):
+        if "source" not in classification:  # local and reused answers are not new evidence
+            save_learning_data(text, category, confidence, category)
+        result["status"] = "stored"
+    else:
+        result["status"] = "needs_review"
+    return result
+
+def get_upload_pool():
+    """
+    Process-wide pool that classifies uploads in the background. It bounds the Claude
+    requests in flight, and its jobs keep running while Streamlit reruns the page.
+    """
+    return get_resource("upload_pool", lambda: ThreadPoolExecutor(
+        max_workers=UPLOAD_CONCURRENCY, thread_name_prefix="classify-upload"
+    ))
+
+def submit_uploads(uploaded_files):
+    """
+    Queue every uploaded file not classified yet in this session and return their jobs in upload order.
+    Jobs are kept in st.session_state by content hash, so reruns and re-uploads never resubmit a document.
+    """
+    jobs = st.session_state.setdefault("classification_jobs", {})
+    current = []
+    for uploaded_file in uploaded_files:
+        data = uploaded_file.getvalue()
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in jobs:
+            jobs[digest] = {
+                "digest": digest,
+                "name": uploaded_file.name,
+                "data": data,
+                "future": get_upload_pool().submit(classify_upload, data, uploaded_file.name),
+            }
+        current.append(jobs[digest])
+    return current
+
+def job_row(job):
+    """One row of the live results table"""
+    row = {"File": job["name"], "Status": "Queued", "Category": "", "Confidence": "", "Source": ""}
+    future = job["future"]
+    if future.running():
+        row["Status"] = "Analyzing"
+    elif future.done():
+        if future.exception() is not None:
+            row["Status"] = "Failed"
+            return row
+        result = future.result()
+        row["Status"] = {
+            "stored": "Filed",
+            "needs_review": "Needs review",
+            "extraction_failed": "No text extracted",
+            "classification_failed": "Classification failed",
+        }[result["status"]]
+        if "category" in result:
+            row.update(Category=result["category"], Confidence=f"{result['confidence']:.2%}", Source=result["source"])
+        if "confirmed" in job:
+            row.update(Status="Confirmed", Category=job["confirmed"])
+    return row
+
+def show_jobs(jobs):
+    """Render the results table and progress bar, updating them as each document finishes"""
+    table = st.empty()
+    progress = st.empty()
+    pending = {job["future"] for job in jobs}
+    while True:
+        pending = {future for future in pending if not future.done()}
+        table.dataframe([job_row(job) for job in jobs], hide_index=True)
+        done = len(jobs) - len(pending)
+        progress.progress(done / len(jobs), text=f"{done} of {len(jobs)} documents processed")
+        if not pending:
+            return
+        wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)  # the timeout also refreshes Queued/Analyzing
+
+def review_jobs(jobs):
+    """Let the user confirm the category of every document classified below the confidence threshold"""
+    to_review = [
+        job for job in jobs
+        if job["future"].exception() is None and job["future"].result()["status"] == "needs_review" and "confirmed" not in job
+    ]
+    if not to_review:
+        return
+    st.write("### Please verify these classifications")
+    for job in to_review:
+        result = job["future"].result()
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            correct_category = st.selectbox(
+                f"{job['name']} ({result['confidence']:.2%} {result['category']}):",
+                list(CATEGORIES.keys()),
+                index=list(CATEGORIES.keys()).index(result["category"]) if result["category"] in CATEGORIES else 0,
+                key=f"review-{job['digest']}"
+            )
+        with col2:
+            st.write("")
+            if st.button("Confirm", key=f"confirm-{job['digest']}"):
+                store_document(_named_upload(job["data"], job["name"]), correct_category)
+                # Near-duplicates of this document now follow the correction
+                remember_document(result["text"], PROMPT_VERSION, {"category": correct_category, "confidence": 1.0})
+                save_learning_data(result["text"], result["category"], result["confidence"], correct_category)
+                job["confirmed"] = correct_category
+                st.rerun()
+
 def main():
     st.set_page_config(layout="wide", page_title="Document Classification")
     st.write("# 📂 Document Classification with Learning Feature")
     
-    uploaded_file = st.file_uploader("Upload PDF Document", type="pdf")
+    uploaded_files = st.file_uploader("Upload PDF Documents", type="pdf", accept_multiple_files=True)
     
-    if uploaded_file:
-        with st.spinner("Analyzing document..."):
-            try:
-                text = process_pdf(uploaded_file)
-                if text:
-                    classification = classify_document(text)
-                    
-                    if classification:
-                        category = classification["category"]
-                        confidence = classification["confidence"]
-                        
-                        st.write("### Classification Results")
-                        st.write(f"📑 Category: **{category}**")
-                        st.write(f"🎯 Confidence: **{confidence:.2%}**")
-                        
-                        if confidence >= 0.85:
-                            st.success("High confidence classification!")
-                            store_document(uploaded_file, category)
-                            save_learning_data(text, category, confidence, category)
-                        else:
-                            st.warning("Please verify the classification:")
-                            correct_category = st.selectbox(
-                                "Select correct category:",
-                                list(CATEGORIES.keys()),
-                                index=list(CATEGORIES.keys()).index(category)
-                            )
-                            
-                            if st.button("Confirm Classification"):
-                                store_document(uploaded_file, correct_category)
-                                save_learning_data(text, category, confidence, correct_category)
-                                st.success("Thank you! This feedback will help improve future classifications.")
-                    else:
-                        st.error("Error in classification")
-            except Exception as e:
-                st.error(f"Unexpected error: {str(e)}")
+    if uploaded_files:
+        jobs = submit_uploads(uploaded_files)
+        st.write("### Classification Results")
+        show_jobs(jobs)
+        review_jobs(jobs)
+        if any(job["future"].exception() is None and job["future"].result()["status"] == "stored" for job in jobs):
+            st.success("Documents classified with high confidence were filed automatically.")
+        if any("confirmed" in job for job in jobs):
+            st.success("Thank you! This feedback will help improve future classifications.")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in ("batch", "fast-path-report", "export-feedback"):
+        sys.exit(batch_main())
     main()
@@ -0,0 +1,330 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import faiss
+import numpy as np
+
+# User corrections: metadata in SQLite, vectors in a FAISS index keyed by the same int64 ids
+CORRECTIONS_DB = "corrections.db"
+CORRECTIONS_INDEX = "corrections.faiss"
+VECTOR_DIM = 384  # MiniLM embedding dimension
+
+# Index tiers: exact search while small, approximate search once it stops scaling
+INDEX_KINDS = ("flat", "hnsw", "ivfpq")
+ANN_THRESHOLD = 50000  # corrections
+ANN_INDEX = "hnsw"  # "ivfpq" trades some recall for a much smaller index
+HNSW_NEIGHBORS = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16
+PQ_SUBQUANTIZERS = 48  # 8 dimensions per sub-quantizer
+# The database is the source of truth: new corrections reach the index file on this schedule and at exit,
+# and whatever a crash loses in between is re-added from the database when the index is next loaded
+INDEX_WRITE_INTERVAL_SECONDS = 60
+
+_lock = threading.RLock()
+_index = None
+_index_mtime = None
+_rebuild_thread = None
+_unsaved = 0  # corrections in the in-memory index but not yet in the index file
+_last_write = 0.0
+logger = logging.getLogger(__name__)
+
+
+def _connect():
+    conn = sqlite3.connect(CORRECTIONS_DB, timeout=30)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS corrections (
+            id INTEGER PRIMARY KEY,
+            text TEXT NOT NULL,
+            category TEXT NOT NULL,
+            embedding BLOB NOT NULL,
+            created_at TEXT NOT NULL
+        )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_corrections_category ON corrections (category)")
+    return conn
+
+
+def _as_vector(embedding):
+    return np.asarray(embedding, dtype=np.float32).reshape(1, VECTOR_DIM)
+
+
+def index_kind(index):
+    """Return which of INDEX_KINDS an index is"""
+    inner = faiss.downcast_index(index.index)
+    if isinstance(inner, faiss.IndexHNSWFlat):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivfpq"
+    return "flat"
+
+
+def target_index_kind(size):
+    return ANN_INDEX if size >= ANN_THRESHOLD else "flat"
+
+
+def _set_search_params(index):
+    inner = faiss.downcast_index(index.index)
+    if isinstance(inner, faiss.IndexHNSWFlat):
+        inner.hnsw.efSearch = HNSW_EF_SEARCH
+    elif isinstance(inner, faiss.IndexIVFPQ):
+        inner.nprobe = IVF_NPROBE
+
+
+def build_index(kind, ids, vectors):
+    """
+    Build an ID-mapped index of the given kind over (ids, vectors).
+    IVF-PQ is trained on the vectors it indexes, so it needs a few thousand of them.
+    """
+    if kind == "hnsw":
+        inner = faiss.IndexHNSWFlat(VECTOR_DIM, HNSW_NEIGHBORS)
+        inner.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif kind == "ivfpq":
+        nlist = max(1, int(4 * np.sqrt(len(vectors))))
+        inner = faiss.index_factory(VECTOR_DIM, f"IVF{nlist},PQ{PQ_SUBQUANTIZERS}")
+        inner.train(vectors)
+    elif kind == "flat":
+        inner = faiss.IndexFlatL2(VECTOR_DIM)
+    else:
+        raise ValueError(f"Unknown index kind: {kind}")
+    index = faiss.IndexIDMap(inner)
+    _set_search_params(index)
+    if len(ids):
+        index.add_with_ids(vectors, ids)
+    return index
+
+
+def _new_index():
+    return build_index("flat", np.empty(0, dtype=np.int64), np.empty((0, VECTOR_DIM), dtype=np.float32))
+
+
+def _stored_vectors(conn):
+    rows = conn.execute("SELECT id, embedding FROM corrections ORDER BY id").fetchall()
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    if not rows:
+        return ids, np.empty((0, VECTOR_DIM), dtype=np.float32)
+    return ids, np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+
+
+def load_stored_vectors():
+    """Return (ids, vectors) of every stored correction, e.g. to build or benchmark an index"""
+    with _connect() as conn:
+        return _stored_vectors(conn)
+
+
+def _write_index(index):
+    """Write the index to a temporary file and atomically move it into place"""
+    global _unsaved, _last_write
+    directory = os.path.dirname(os.path.abspath(CORRECTIONS_INDEX))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        faiss.write_index(index, tmp_path)
+        os.replace(tmp_path, CORRECTIONS_INDEX)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    _unsaved, _last_write = 0, time.monotonic()
+
+
+def _save_if_due(index):
+    """Write the index if it holds unsaved corrections and the last write is INDEX_WRITE_INTERVAL_SECONDS old"""
+    global _index_mtime
+    if _unsaved and time.monotonic() - _last_write >= INDEX_WRITE_INTERVAL_SECONDS:
+        _write_index(index)
+        _index_mtime = os.path.getmtime(CORRECTIONS_INDEX)
+
+
+def save_correction_index():
+    """Write unsaved corrections to the index file now; runs at interpreter exit"""
+    global _index_mtime
+    with _lock:
+        if _index is not None and _unsaved:
+            _write_index(_index)
+            _index_mtime = os.path.getmtime(CORRECTIONS_INDEX)
+
+
+atexit.register(save_correction_index)
+
+
+def _reconcile(index, conn):
+    """
+    Make the index hold exactly the ids in the database, e.g. after a crash between the two writes.
+    Returns the reconciled index (HNSW cannot remove entries, so it is rebuilt instead) and whether it changed.
+    """
+    index_ids = set(faiss.vector_to_array(index.id_map).tolist()) if index.ntotal else set()
+    db_ids = {row[0] for row in conn.execute("SELECT id FROM corrections")}
+
+    stale = index_ids - db_ids
+    if stale and index_kind(index) == "hnsw":
+        ids, vectors = _stored_vectors(conn)
+        return build_index("hnsw", ids, vectors), True
+    if stale:
+        index.remove_ids(np.array(sorted(stale), dtype=np.int64))
+    missing = sorted(db_ids - index_ids)
+    for start in range(0, len(missing), 1000):
+        batch = missing[start:start + 1000]
+        rows = conn.execute(
+            f"SELECT id, embedding FROM corrections WHERE id IN ({','.join('?' * len(batch))})", batch
+        ).fetchall()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        vectors = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+        index.add_with_ids(vectors, ids)
+    return index, bool(stale or missing)
+
+
+def _load_index():
+    global _index, _index_mtime
+    mtime = os.path.getmtime(CORRECTIONS_INDEX) if os.path.exists(CORRECTIONS_INDEX) else None
+    if _index is not None and mtime == _index_mtime:
+        return _index
+
+    index = faiss.read_index(CORRECTIONS_INDEX) if mtime is not None else _new_index()
+    _set_search_params(index)
+    with _connect() as conn:
+        index, changed = _reconcile(index, conn)
+    if changed:
+        _write_index(index)
+        mtime = os.path.getmtime(CORRECTIONS_INDEX)
+    _index, _index_mtime = index, mtime
+    _maybe_rebuild(_index)
+    return _index
+
+
+def load_correction_index():
+    """Load and reconcile the correction index now rather than on the first search"""
+    with _lock:
+        return _load_index()
+
+
+def _maybe_rebuild(index):
+    """Start a background rebuild when the store has outgrown (or undershot) the current index kind"""
+    global _rebuild_thread
+    if index_kind(index) == target_index_kind(index.ntotal):
+        return
+    if _rebuild_thread is not None and _rebuild_thread.is_alive():
+        return
+    _rebuild_thread = threading.Thread(target=_rebuild_index, name="correction-index-rebuild", daemon=True)
+    _rebuild_thread.start()
+
+
+def _rebuild_index():
+    """Build the index for the current store size off the request path, then swap it in"""
+    global _index, _index_mtime
+    try:
+        with _connect() as conn:
+            ids, vectors = _stored_vectors(conn)
+        kind = target_index_kind(len(ids))
+        index = build_index(kind, ids, vectors)
+        with _lock:
+            # Corrections stored while the index was being built are added here
+            with _connect() as conn:
+                index, _ = _reconcile(index, conn)
+            _write_index(index)
+            _index, _index_mtime = index, os.path.getmtime(CORRECTIONS_INDEX)
+        logger.info("Rebuilt correction index as %s with %d entries", kind, index.ntotal)
+    except Exception:
+        logger.exception("Correction index rebuild failed; keeping the current index")
+
+
+def add_corrections(corrections):
+    """
+    Store (text, category, embedding) corrections in one transaction and one index insert.
+    Database rows and index entries share int64 ids, which are returned in order.
+    """
+    global _unsaved
+    corrections = list(corrections)
+    if not corrections:
+        return []
+    vectors = np.vstack([_as_vector(embedding) for _, _, embedding in corrections])
+    created_at = datetime.now().isoformat()
+    with _lock:
+        index = _load_index()
+        with _connect() as conn:
+            ids = [
+                conn.execute(
+                    "INSERT INTO corrections (text, category, embedding, created_at) VALUES (?, ?, ?, ?)",
+                    (text, category, vector.tobytes(), created_at),
+                ).lastrowid
+                for (text, category, _), vector in zip(corrections, vectors)
+            ]
+        index.add_with_ids(vectors, np.array(ids, dtype=np.int64))
+        _unsaved += len(ids)
+        _save_if_due(index)
+        _maybe_rebuild(index)
+        return ids
+
+
+def add_correction(text, category, embedding):
+    """Store a correction; the database row and index entry share one int64 id"""
+    return add_corrections([(text, category, embedding)])[0]
+
+
+def get_correction(correction_id):
+    """Resolve a correction id to its stored text and category"""
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT id, text, category, created_at FROM corrections WHERE id = ?", (int(correction_id),)
+        ).fetchone()
+    if row is None:
+        return None
+    return {"id": row[0], "text": row[1], "category": row[2], "created_at": row[3]}
+
+
+def count_corrections():
+    with _connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM corrections").fetchone()[0]
+
+
+def load_corrections():
+    """Return every stored correction with its embedding, oldest first"""
+    with _connect() as conn:
+        rows = conn.execute("SELECT id, text, category, embedding FROM corrections ORDER BY id").fetchall()
+    return [
+        {"id": row[0], "text": row[1], "category": row[2], "embedding": np.frombuffer(row[3], dtype=np.float32)}
+        for row in rows
+    ]
+
+
+def find_similar_corrections(embedding, k=1):
+    """Return the k stored corrections closest to an embedding, nearest first"""
+    with _lock:
+        index = _load_index()
+        if index.ntotal == 0:
+            return []
+        distances, ids = index.search(_as_vector(embedding), min(k, index.ntotal))
+    matches = []
+    for distance, correction_id in zip(distances[0], ids[0]):
+        if correction_id < 0:
+            continue
+        correction = get_correction(correction_id)
+        if correction:
+            correction["distance"] = float(distance)
+            matches.append(correction)
+    return matches
+
+
+def import_legacy_corrections(corrections_file, encode):
+    """One-off import of a {text: category} corrections.json into an empty store"""
+    if not os.path.exists(corrections_file):
+        return 0
+    with _connect() as conn:
+        if conn.execute("SELECT 1 FROM corrections LIMIT 1").fetchone():
+            return 0
+    with open(corrections_file, "r") as f:
+        legacy = json.load(f)
+    embeddings = encode(list(legacy))  # one batched call for the whole file
+    add_corrections(
+        (text, category if isinstance(category, str) else json.dumps(category), embedding)
+        for (text, category), embedding in zip(legacy.items(), embeddings)
+    )
+    save_correction_index()
+    return len(legacy)
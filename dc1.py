@@ -1,8 +1,9 @@
 import streamlit as st
-from langchain_anthropic import ChatAnthropic
-import PyPDF2
+from llm_clients import get_llm, cached_prompt_messages, record_prompt_cache_usage, get_prompt_cache_stats
 import os
-import json
+from classification_cache import get_cached_classification, cache_classification
+from pdf_extraction import extract_text_with_budget
+from llm_json import LLMJSONError, classification_schema, parse_llm_json
 
 # Load API key securely
 ANTHROPIC_API_KEY = st.secrets.get("ANTHROPIC_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
@@ -10,6 +11,11 @@ if not ANTHROPIC_API_KEY:
     st.error("❌ Anthropic API Key not found! Please add it to secrets.toml or set it as an environment variable.")
     st.stop()
 
+MODEL_NAME = "claude-3-sonnet-20240229"
+PROMPT_VERSION = "dc1-v2"
+CLASSIFICATION_SCHEMA = classification_schema()
+MAX_TEXT_CHARS = 4000  # character budget for classification input
+
 # Categories dictionary (for reference in the UI)
 CATEGORIES = {
     "Finance & Accounting": "Invoices, tax returns, payroll, audit reports, financial statements, accounts payable, balance sheets",
@@ -29,33 +35,8 @@ CATEGORIES = {
     "Ambiguous": "Document has nearly equal signals across multiple categories; requires human review."
 }
 
-def extract_text_from_pdf(file):
-    """
-    Extracts text from a PDF file, returning up to 4000 characters.
-    """
-    try:
-        pdf_reader = PyPDF2.PdfReader(file)
-        text = "\n".join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
-        return text[:4000] if text.strip() else None
-    except Exception as e:
-        st.error(f"❌ PDF Processing Error: {str(e)}")
-        return None
-
-def classify_document(text):
-    """
-    Classifies the document text using ChatAnthropic with an extended prompt that includes
-    few-shot examples for all categories and specific guidance for ambiguous cases.
-    """
-    try:
-        llm = ChatAnthropic(
-            model="claude-3-sonnet-20240229",  # update model if needed
-            anthropic_api_key=ANTHROPIC_API_KEY,
-            max_tokens=3000,
-            temperature=0.0
-        )
-        
-        prompt = f"""
-You are an AI-powered document classifier for a large multinational enterprise. Your role is to analyze and classify complex documents into the most appropriate business category. You must follow the steps below exactly and provide detailed reasoning along with alternative categories if uncertainty exists. If you are unsure (i.e. your confidence is low), indicate this clearly and request human review.
+# Static classifier instructions, sent as a cacheable system prompt
+CLASSIFIER_SYSTEM_PROMPT = """You are an AI-powered document classifier for a large multinational enterprise. Your role is to analyze and classify complex documents into the most appropriate business category. You must follow the steps below exactly and provide detailed reasoning along with alternative categories if uncertainty exists. If you are unsure (i.e. your confidence is low), indicate this clearly and request human review.
 
 Step 1 – Preprocessing:
 • Limit the text to the first 4000 characters.
@@ -110,7 +91,7 @@ Step 6 – Additional Analyses:
 
 Step 7 – Output:
 Return your result strictly in JSON format with the following keys:
-{{
+{
   "category": "Best Matching Category",
   "confidence": <value between 0 and 1>,
   "key_phrases": [list of phrases],
@@ -119,7 +100,7 @@ Return your result strictly in JSON format with the following keys:
   "contains_pii": "yes/no",
   "sentiment_analysis": "Positive/Neutral/Negative",
   "archival_recommendation": "Retention duration and rationale"
-}}
+}
 
 Follow these steps precisely. If your analysis is ambiguous or your confidence is low, include that in your explanation and request human review.
 
@@ -288,22 +269,49 @@ Title: Company-wide Announcement and Travel Policy Update
 This document includes travel policy updates, internal newsletters, and general company announcements. It lacks deep domain-specific details and is broadly applicable.  
 **Correct Classification:** General / Miscellaneous  
 **Explanation:** Generic content and broad scope indicate a miscellaneous classification.  
-*Assign a confidence of at least 0.90.*
+*Assign a confidence of at least 0.90.*"""
 
----
-Document:
-{text}
-"""
+def extract_text_from_pdf(file):
+    """
+    Extracts text from a PDF file, returning up to 4000 characters.
+    """
+    try:
+        text = extract_text_with_budget(file, MAX_TEXT_CHARS)
+        return text if text.strip() else None
+    except Exception as e:
+        st.error(f"❌ PDF Processing Error: {str(e)}")
+        return None
 
-        response = llm.invoke(prompt)
+def classify_document(text):
+    """
+    Classifies the document text using ChatAnthropic with an extended prompt that includes
+    few-shot examples for all categories and specific guidance for ambiguous cases.
+    """
+    cached = get_cached_classification(text, PROMPT_VERSION, MODEL_NAME)
+    if cached is not None:
+        return cached
+    try:
+        llm = get_llm(
+            model=MODEL_NAME,  # update model if needed
+            api_key=ANTHROPIC_API_KEY,
+            max_tokens=3000,
+            temperature=0.0
+        )
+        
+        messages = cached_prompt_messages(CLASSIFIER_SYSTEM_PROMPT, f"Document:\n{text}")
+
+        response = llm.invoke(messages)
+        record_prompt_cache_usage(response)
         if response is None or not response.content.strip():
             st.error("❌ Claude API returned an empty response.")
             return None
         try:
-            return json.loads(response.content)
-        except json.JSONDecodeError as e:
+            classification_data = parse_llm_json(llm, response.content, CLASSIFICATION_SCHEMA)
+        except LLMJSONError as e:
             st.error(f"❌ JSON Parsing Error: {e}")
             return None
+        cache_classification(text, PROMPT_VERSION, MODEL_NAME, classification_data)
+        return classification_data
 
     except Exception as e:
         st.error(f"❌ Claude API Error: {e}")
@@ -342,6 +350,10 @@ def main():
         st.write(f"🧠 Sentiment: {classification.get('sentiment_analysis', 'Neutral')}")
         st.write(f"📂 Archival Recommendation: {classification.get('archival_recommendation', 'No recommendation')}")
 
+        cache_stats = get_prompt_cache_stats()
+        st.caption(f"🧾 Prompt cache: {cache_stats['cache_read_input_tokens']} cached / "
+                   f"{cache_stats['uncached_input_tokens'] + cache_stats['cache_creation_input_tokens']} uncached input tokens since the app started (all sessions)")
+
         # If category is "Ambiguous," or confidence is below threshold, request feedback
         if category == "Ambiguous":
             st.warning("⚠️ The document is flagged as ambiguous. Please provide your feedback.")
@@ -1,8 +1,10 @@
 import streamlit as st
-from langchain_anthropic import ChatAnthropic
-import PyPDF2
+from llm_clients import get_llm, cached_prompt_messages, record_prompt_cache_usage, get_prompt_cache_stats
 import os
-import json
+from classification_cache import get_cached_classification, cache_classification
+from pdf_extraction import extract_text_with_budget
+from llm_json import LLMJSONError, classification_schema, parse_llm_json
+from keyword_scorer import keyword_features, classify_by_keywords, format_keyword_features
 
 # Load API key securely
 ANTHROPIC_API_KEY = st.secrets.get("ANTHROPIC_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
@@ -10,6 +12,11 @@ if not ANTHROPIC_API_KEY:
     st.error("❌ Anthropic API Key not found! Please add it to secrets.toml or set it as an environment variable.")
     st.stop()
 
+MODEL_NAME = "claude-3-sonnet-20240229"
+PROMPT_VERSION = "dc2-v3"
+CLASSIFICATION_SCHEMA = classification_schema()
+MAX_TEXT_CHARS = 4000  # character budget for classification input
+
 # Categories dictionary (for reference in the UI)
 CATEGORIES = {
     "Finance & Accounting": "Invoices, tax returns, payroll, audit reports, financial statements, accounts payable, balance sheets",
@@ -29,34 +36,8 @@ CATEGORIES = {
     "Ambiguous": "Document has nearly equal signals across multiple categories; requires human review."
 }
 
-def extract_text_from_pdf(file):
-    """
-    Extracts text from a PDF file, returning up to 4000 characters.
-    """
-    try:
-        pdf_reader = PyPDF2.PdfReader(file)
-        text = "\n".join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
-        return text[:4000] if text.strip() else None
-    except Exception as e:
-        st.error(f"❌ PDF Processing Error: {str(e)}")
-        return None
-
-def classify_document(text):
-    """
-    Classifies the document text using ChatAnthropic with an extended prompt that includes
-    detailed instructions and few-shot examples. If the document is ambiguous, the AI must
-    set the category to "Ambiguous" with a confidence below 0.85 (e.g., around 0.45-0.50).
-    """
-    try:
-        llm = ChatAnthropic(
-            model="claude-3-sonnet-20240229",  # Update model if needed
-            anthropic_api_key=ANTHROPIC_API_KEY,
-            max_tokens=3000,
-            temperature=0.0
-        )
-        
-        prompt = f"""
-You are an AI-powered document classifier for a large multinational enterprise. Your role is to analyze and classify complex documents into the most appropriate business category from the following list:
+# Static classifier instructions, sent as a cacheable system prompt
+CLASSIFIER_SYSTEM_PROMPT = """You are an AI-powered document classifier for a large multinational enterprise. Your role is to analyze and classify complex documents into the most appropriate business category from the following list:
 - Finance & Accounting
 - Legal & Compliance
 - HR
@@ -86,30 +67,15 @@ Follow these steps precisely:
 
 2. **Keyword & Phrase Extraction:**
    - Identify significant keywords/phrases (domain-specific terms, proper nouns, acronyms, quantitative terms, modifiers).
-   - Use these domain keywords:
-     - Finance: invoice, audit, budget, cash flow, profit margin, revenue, tax return, debt-to-equity, etc.
-     - Legal: contract, NDA, compliance, arbitration, litigation, etc.
-     - HR: employee, performance review, recruitment, training, career development, employee engagement, retention, etc.
-     - Marketing: campaign, digital, conversion, SEO, customer engagement, ROI, brand image, etc.
-     - Operations: production, quality control, maintenance, inventory, scheduling, warehouse, efficiency, etc.
-     - Procurement: RFQ, vendor, procurement, supplier, contract, negotiation, etc.
-     - IT: cybersecurity, software update, network, vulnerability, intrusion, etc.
-     - Executive: strategic planning, board meeting, CEO, organizational restructuring, etc.
-     - Customer Service: support ticket, refund, complaint, service agreement, resolution, etc.
-     - Facility: maintenance, repair, safety, lease, emergency, etc.
-     - CSR: sustainability, environmental, eco-friendly, ethical sourcing, etc.
-     - R&D: research, prototype, innovation, feasibility, development, etc.
-     - Spam: free, click, prize, scam, fraudulent, etc.
-     - General: announcement, newsletter, policy, travel, event, etc.
+   - Domain keyword evidence has already been computed: the document comes with a relevance score per category (weighted keyword counts, normalized so the strongest category is 1.00) and the list of matched keywords. Use these as the keyword evidence instead of counting keywords yourself.
 
 3. **Semantic Analysis:**
    - Extract context (surrounding sentences/paragraphs) for each keyword.
    - Analyze co-occurrence and domain-specific language; consider modifiers (e.g., "final audited report" vs. "draft report") and note if keywords appear in key positions (e.g., headers, introductions).
 
 4. **Relevance Scoring & Confidence:**
-   - Count and weight keyword occurrences based on prominence and context.
-   - Normalize the scores (0–1 scale) for each category.
-   - Identify the primary category (highest score) and list alternatives if scores are within 10% of the highest.
+   - Start from the precomputed keyword scores and adjust them for context (modifiers, key positions, boilerplate).
+   - Identify the primary category (highest adjusted score) and list alternatives if scores are within 10% of the highest.
    - **IMPORTANT:**
      - If robust signals are present for one domain, assign a high confidence (≥ 0.90).
      - If overall signals are low or nearly equal across domains, set the category to "Ambiguous" and explicitly assign a confidence below 0.85 (for example, around 0.45-0.50).
@@ -117,7 +83,7 @@ Follow these steps precisely:
 
 5. **Output Format:**
 Return the result strictly in JSON with the following keys:
-{{
+{
   "category": "Best Matching Category",
   "confidence": <value between 0 and 1>,
   "key_phrases": [list of phrases],
@@ -126,7 +92,7 @@ Return the result strictly in JSON with the following keys:
   "contains_pii": "yes/no",
   "sentiment_analysis": "Positive/Neutral/Negative",
   "archival_recommendation": "Retention duration and rationale"
-}}
+}
 
 6. **Review:**
    - If the category is "Ambiguous" or if the confidence is ≤ 0.85, human review is required.
@@ -369,21 +335,56 @@ Explanation: Scam language clearly indicates this category.
     Discusses executive leadership changes and strategic planning alongside a review of financial oversight metrics. The dominant theme is executive strategy.
     Correct Classification: Executive Office / Strategy  
     Expected Confidence: 0.95  
-    Explanation: Leadership and strategic focus indicate an executive classification.
+    Explanation: Leadership and strategic focus indicate an executive classification."""
 
----
-Document:
-{text}
-"""
-        response = llm.invoke(prompt)
+def extract_text_from_pdf(file):
+    """
+    Extracts text from a PDF file, returning up to 4000 characters.
+    """
+    try:
+        text = extract_text_with_budget(file, MAX_TEXT_CHARS)
+        return text if text.strip() else None
+    except Exception as e:
+        st.error(f"❌ PDF Processing Error: {str(e)}")
+        return None
+
+def classify_document(text):
+    """
+    Classifies the document text using ChatAnthropic with an extended prompt that includes
+    detailed instructions and few-shot examples. If the document is ambiguous, the AI must
+    set the category to "Ambiguous" with a confidence below 0.85 (e.g., around 0.45-0.50).
+    Keyword scoring runs locally first: clear-cut documents are decided without the LLM,
+    and for the rest the scores are passed to Claude as precomputed features.
+    """
+    features = keyword_features(text)
+    decision = classify_by_keywords(features)
+    if decision is not None:
+        return decision
+
+    cached = get_cached_classification(text, PROMPT_VERSION, MODEL_NAME)
+    if cached is not None:
+        return cached
+    try:
+        llm = get_llm(
+            model=MODEL_NAME,  # Update model if needed
+            api_key=ANTHROPIC_API_KEY,
+            max_tokens=3000,
+            temperature=0.0
+        )
+        
+        messages = cached_prompt_messages(CLASSIFIER_SYSTEM_PROMPT, f"{format_keyword_features(features)}\n\nDocument:\n{text}")
+        response = llm.invoke(messages)
+        record_prompt_cache_usage(response)
         if response is None or not response.content.strip():
             st.error("❌ Claude API returned an empty response.")
             return None
         try:
-            return json.loads(response.content)
-        except json.JSONDecodeError as e:
+            classification_data = parse_llm_json(llm, response.content, CLASSIFICATION_SCHEMA)
+        except LLMJSONError as e:
             st.error(f"❌ JSON Parsing Error: {e}")
             return None
+        cache_classification(text, PROMPT_VERSION, MODEL_NAME, classification_data)
+        return classification_data
     except Exception as e:
         st.error(f"❌ Claude API Error: {e}")
         return None
@@ -421,6 +422,10 @@ def main():
         st.write(f"🧠 Sentiment: {classification.get('sentiment_analysis', 'Neutral')}")
         st.write(f"📂 Archival Recommendation: {classification.get('archival_recommendation', 'No recommendation')}")
 
+        cache_stats = get_prompt_cache_stats()
+        st.caption(f"🧾 Prompt cache: {cache_stats['cache_read_input_tokens']} cached / "
+                   f"{cache_stats['uncached_input_tokens'] + cache_stats['cache_creation_input_tokens']} uncached input tokens since the app started (all sessions)")
+
         # Request feedback if category is "Ambiguous" or if confidence <= 0.85
         if category == "Ambiguous" or confidence <= 0.85:
             st.warning("⚠️ AI is uncertain or ambiguous! Please provide your feedback with detailed reasoning.")
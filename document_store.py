@@ -0,0 +1,115 @@
+import hashlib
+import os
+import sqlite3
+import stat
+import tempfile
+import uuid
+from datetime import datetime
+
+# Content-addressed document storage: each distinct PDF is stored once under its SHA-256,
+# category folders hold hardlinks to the blobs, and a manifest records every filing.
+BLOB_DIR = "document_blobs"
+MANIFEST_DB = "document_manifest.db"
+FILED_DOCS_DIR = "classified_docs"
+
+
+def _connect():
+    conn = sqlite3.connect(MANIFEST_DB, timeout=30)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS filed_documents (
+            id INTEGER PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            category TEXT NOT NULL,
+            name TEXT NOT NULL,
+            path TEXT NOT NULL,
+            filed_at TEXT NOT NULL,
+            UNIQUE (sha256, category, name)
+        )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_filed_documents_category ON filed_documents (category)")
+    return conn
+
+
+def blob_path(digest):
+    """Blobs are sharded by the first two byte pairs of their digest to keep directories small"""
+    return os.path.join(BLOB_DIR, digest[:2], digest[2:4], digest)
+
+
+def _atomic_write(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def store_blob(data):
+    """Store bytes under their SHA-256 and return the digest; content already stored is not written again"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = blob_path(digest)
+    if not os.path.exists(path):
+        _atomic_write(path, data)
+        os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)  # shared by every link, so never edited in place
+    return digest
+
+
+def _link_into_place(source, destination):
+    """Hardlink source to destination atomically, copying instead where hardlinks are not supported"""
+    directory = os.path.dirname(destination)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{os.path.basename(destination)}.{uuid.uuid4().hex}.tmp")
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        with open(source, "rb") as f:
+            _atomic_write(destination, f.read())
+        return
+    try:
+        os.replace(tmp_path, destination)
+    except OSError:
+        os.remove(tmp_path)
+        raise
+
+
+def file_document(data, name, category, root=FILED_DOCS_DIR):
+    """
+    File a document under root/<category>/ and return its path there.
+    The file name is prefixed with the content hash instead of a timestamp, so filing the
+    same document again is a no-op and two uploads in the same second never collide.
+    """
+    digest = store_blob(data)
+    name = os.path.basename(name)
+    path = os.path.join(root, category, f"{digest[:12]}_{name}")
+    if not os.path.exists(path):
+        _link_into_place(blob_path(digest), path)
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO filed_documents (sha256, category, name, path, filed_at) VALUES (?, ?, ?, ?, ?)",
+            (digest, category, name, path, datetime.now().isoformat(sep=" ")),
+        )
+    return path
+
+
+def documents_in_category(category):
+    """Return the manifest entries filed under a category, newest first"""
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT sha256, name, path, filed_at FROM filed_documents WHERE category = ? ORDER BY id DESC", (category,)
+        ).fetchall()
+    return [dict(zip(("sha256", "name", "path", "filed_at"), row)) for row in rows]
+
+
+def find_filings(data):
+    """Return every category/path a document's content has been filed under"""
+    digest = hashlib.sha256(data).hexdigest()
+    with _connect() as conn:
+        rows = conn.execute("SELECT category, path FROM filed_documents WHERE sha256 = ?", (digest,)).fetchall()
+    return [{"category": category, "path": path} for category, path in rows]
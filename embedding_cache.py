@@ -0,0 +1,160 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from shared_resources import EMBEDDING_MODEL_NAME, get_embedding_model
+
+# Embeddings keyed by content hash: vectors in a memory-mapped float32 matrix,
+# key -> row slot and last use in SQLite. Each slot also stores the key digest,
+# so a slot that was overwritten after its row was written is detected as a miss.
+EMBEDDING_CACHE_DB = "embedding_cache.db"
+EMBEDDING_CACHE_MATRIX = "embedding_cache.f32"
+EMBEDDING_CACHE_DIGESTS = "embedding_cache.keys"
+EMBEDDING_CACHE_CAPACITY = 20000  # rows; about 30 MB for 384-dimensional vectors
+EMBEDDING_DIM = 384
+EMBEDDING_BATCH_SIZE = 64  # sentences per forward pass; larger batches stop paying off on CPU
+
+EMBEDDING_CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+_lock = threading.Lock()
+_matrix = None
+_digests = None
+
+
+def _connect():
+    conn = sqlite3.connect(EMBEDDING_CACHE_DB, timeout=30)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS embeddings (
+            key TEXT PRIMARY KEY,
+            slot INTEGER UNIQUE NOT NULL,
+            last_used REAL NOT NULL
+        )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+    return conn
+
+
+def _open_memmap(path, dtype, width):
+    shape = (EMBEDDING_CACHE_CAPACITY, width)
+    expected_size = EMBEDDING_CACHE_CAPACITY * width * np.dtype(dtype).itemsize
+    mode = "r+" if os.path.exists(path) and os.path.getsize(path) == expected_size else "w+"
+    return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+
+def _open_cache():
+    """Open the matrix and digest files, sized for EMBEDDING_CACHE_CAPACITY"""
+    global _matrix, _digests
+    if _matrix is None:
+        _matrix = _open_memmap(EMBEDDING_CACHE_MATRIX, np.float32, EMBEDDING_DIM)
+        _digests = _open_memmap(EMBEDDING_CACHE_DIGESTS, np.uint8, 32)
+    return _matrix, _digests
+
+
+def make_embedding_key(text, normalize=False):
+    digest = hashlib.sha256()
+    for part in (EMBEDDING_MODEL_NAME, "normalized" if normalize else "raw", text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _lookup(conn, keys, matrix, digests):
+    """Return {key: vector} for the cached keys and mark them as used"""
+    found = {}
+    for start in range(0, len(keys), 500):
+        batch = keys[start:start + 500]
+        rows = conn.execute(
+            f"SELECT key, slot FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+        ).fetchall()
+        for key, slot in rows:
+            if bytes(digests[slot]) == bytes.fromhex(key):
+                found[key] = np.array(matrix[slot])
+    if found:
+        conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(time.time(), key) for key in found])
+    return found
+
+
+def _store(conn, vectors_by_key, matrix, digests):
+    """Write new embeddings into free slots, evicting the least recently used rows when full"""
+    items = list(vectors_by_key.items())[-EMBEDDING_CACHE_CAPACITY:]
+    conn.execute("BEGIN IMMEDIATE")
+    used = {row[0] for row in conn.execute("SELECT slot FROM embeddings")}
+    free = [slot for slot in range(EMBEDDING_CACHE_CAPACITY) if slot not in used][:len(items)]
+    evicted = []
+    if len(free) < len(items):
+        evicted = conn.execute(
+            "SELECT key, slot FROM embeddings ORDER BY last_used LIMIT ?", (len(items) - len(free),)
+        ).fetchall()
+        conn.executemany("DELETE FROM embeddings WHERE key = ?", [(key,) for key, _ in evicted])
+        free.extend(slot for _, slot in evicted)
+
+    now = time.time()
+    for (key, vector), slot in zip(items, free):
+        matrix[slot] = vector
+        digests[slot] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+    matrix.flush()
+    digests.flush()
+    conn.executemany(
+        "INSERT OR REPLACE INTO embeddings (key, slot, last_used) VALUES (?, ?, ?)",
+        [(key, slot, now) for (key, _), slot in zip(items, free)],
+    )
+    conn.commit()
+    return len(evicted)
+
+
+def embed_texts(texts, normalize=False, batch_size=EMBEDDING_BATCH_SIZE):
+    """
+    Embed many texts, returning an (n, EMBEDDING_DIM) float32 array in input order.
+    Cached texts are read from the memory-mapped cache; the rest are deduplicated and
+    embedded in a single encode call, then cached.
+    """
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+    keys = [make_embedding_key(text, normalize) for text in texts]
+
+    with _lock:
+        matrix, digests = _open_cache()
+        try:
+            with _connect() as conn:
+                found = _lookup(conn, list(set(keys)), matrix, digests)
+        except sqlite3.Error:
+            found = {}
+    missing = {key: text for key, text in zip(keys, texts) if key not in found}
+
+    evictions = 0
+    if missing:
+        # Encoding runs outside the lock so cache hits from other sessions are not held up
+        encoded = get_embedding_model().encode(
+            list(missing.values()), batch_size=batch_size, normalize_embeddings=normalize
+        )
+        new_vectors = dict(zip(missing, np.asarray(encoded, dtype=np.float32)))
+        found.update(new_vectors)
+        with _lock:
+            conn = _connect()
+            try:
+                evictions = _store(conn, new_vectors, matrix, digests)
+            except sqlite3.Error:
+                conn.rollback()
+            finally:
+                conn.close()
+
+    with _lock:
+        EMBEDDING_CACHE_STATS["hits"] += len(set(keys)) - len(missing)
+        EMBEDDING_CACHE_STATS["misses"] += len(missing)
+        EMBEDDING_CACHE_STATS["evictions"] += evictions
+    return np.vstack([found[key] for key in keys])
+
+
+def embed_text(text, normalize=False):
+    """Embed a single text through the cache"""
+    return embed_texts([text], normalize)[0]
+
+
+def get_embedding_cache_stats():
+    """Return hit/miss/eviction counters for this process"""
+    with _lock:
+        return dict(EMBEDDING_CACHE_STATS)
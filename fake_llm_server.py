@@ -0,0 +1,94 @@
+"""
+Stand-in for the Anthropic Messages API, for exercising the pages and service.py end to end
+without network access or API cost. Answers every prompt with a canned reply of the right shape:
+
+    python fake_llm_server.py --port 9000 --delay 0.5
+    ANTHROPIC_API_URL=http://127.0.0.1:9000 python service.py
+
+GET /requests returns how many messages were answered, e.g. to check that coalesced
+requests made a single upstream call.
+"""
+import argparse
+import asyncio
+import json
+import uuid
+
+from aiohttp import web
+
+CLASSIFICATION_REPLY = "{'category': 'Finance', 'confidence': 0.92}"
+EXTRACTION_REPLY = json.dumps({
+    "document_type": "Invoice",
+    "extracted_fields": [
+        {"field_name": "Invoice Number", "original_label": "Rechnungsnummer", "value": "RE-1001", "confidence": "high"}
+    ],
+    "amounts": {"net_amount": "100.00", "tax_amount": "19.00", "total_amount": "119.00", "currency": "EUR"},
+    "line_items": [
+        {"description": "Consulting", "quantity": "1", "unit_price_net": "100.00", "total_price": "100.00"}
+    ],
+    "validation_warnings": [],
+})
+
+
+def _prompt_text(payload):
+    parts = []
+    system = payload.get("system") or []
+    for message in ([{"content": system}] if system else []) + payload.get("messages", []):
+        content = message["content"]
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content)
+    return "\n".join(parts)
+
+
+def canned_reply(prompt):
+    """Pick a reply the calling page can parse, based on the instructions in the prompt"""
+    if "document classification expert" in prompt:
+        return CLASSIFICATION_REPLY
+    if "document analysis expert" in prompt:
+        return EXTRACTION_REPLY
+    if prompt.lstrip().startswith("Translate this text"):
+        return "Übersetzter Text."
+    return "Summary of the document."
+
+
+async def handle_messages(request):
+    payload = await request.json()
+    request.app["counters"]["requests"] += 1
+    await asyncio.sleep(request.app["delay"])
+    reply = canned_reply(_prompt_text(payload))
+    return web.json_response({
+        "id": f"msg_{uuid.uuid4().hex}",
+        "type": "message",
+        "role": "assistant",
+        "model": payload.get("model", "fake"),
+        "content": [{"type": "text", "text": reply}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": len(_prompt_text(payload)) // 4 + 1, "output_tokens": len(reply) // 4 + 1},
+    })
+
+
+async def handle_requests(request):
+    return web.json_response(request.app["counters"])
+
+
+def create_app(delay=0.0):
+    app = web.Application()
+    app["counters"] = {"requests": 0}
+    app["delay"] = delay
+    app.add_routes([web.post("/v1/messages", handle_messages), web.get("/requests", handle_requests)])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve canned Anthropic Messages API replies")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each reply")
+    args = parser.parse_args()
+    web.run_app(create_app(args.delay), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
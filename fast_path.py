@@ -0,0 +1,215 @@
+import hashlib
+import logging
+import threading
+import time
+
+import numpy as np
+
+from correction_store import count_corrections, load_corrections
+from embedding_cache import embed_text, embed_texts
+from feedback_store import feedback_version, iter_feedback
+
+# Local pre-classifier: cosine similarity to per-category embedding centroids,
+# turned into probabilities with a temperature calibrated on held-out feedback.
+FAST_PATH_THRESHOLD = 0.9  # calibrated confidence needed to answer without the LLM
+MIN_CALIBRATION_EXAMPLES = 20  # below this the fast path stays off
+TEST_FRACTION = 0.2
+CALIBRATION_FRACTION = 0.2
+RETRAIN_INTERVAL_SECONDS = 300
+MAX_FEEDBACK_EXAMPLES = 5000  # most recent feedback rows used for training, so retraining cost stays flat
+TEMPERATURES = np.geomspace(0.005, 1.0, 60)
+REPORT_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99)
+
+FAST_PATH_STATS = {"local": 0, "escalated": 0}
+_lock = threading.Lock()  # guards FAST_PATH_STATS and _models; held only briefly
+_train_lock = threading.Lock()  # one training at a time, outside _lock
+_models = {}
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def _split(text):
+    """Assign a text to the train, calibration or test split by its hash, so duplicates never straddle splits"""
+    position = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+    if position < TEST_FRACTION:
+        return "test"
+    if position < TEST_FRACTION + CALIBRATION_FRACTION:
+        return "calibration"
+    return "train"
+
+
+def load_labelled_examples(categories, use_feedback=False):
+    """
+    Collect (text, category, embedding) from stored corrections and, optionally, the
+    MAX_FEEDBACK_EXAMPLES most recent feedback rows whose label is in categories
+    """
+    examples = [
+        (correction["text"], correction["category"], correction["embedding"])
+        for correction in load_corrections()
+        if correction["category"] in categories
+    ]
+    if use_feedback:
+        rows = [(text, category) for text, category in iter_feedback(categories, MAX_FEEDBACK_EXAMPLES) if text.strip()]
+        embeddings = embed_texts([text for text, _ in rows])
+        examples.extend((text, category, embedding) for (text, category), embedding in zip(rows, embeddings))
+    return examples
+
+
+def build_centroids(categories, examples):
+    """Average the examples of each category, seeded with an embedding of the category description"""
+    names = list(categories)
+    centroids = _normalize(embed_texts([f"{name}: {description}" for name, description in categories.items()]))
+    for _, category, embedding in examples:
+        centroids[names.index(category)] += _normalize(embedding)
+    return names, _normalize(centroids)
+
+
+def _probabilities(centroids, embeddings, temperature):
+    scores = _normalize(embeddings) @ centroids.T / temperature
+    scores -= scores.max(axis=-1, keepdims=True)
+    probabilities = np.exp(scores)
+    return probabilities / probabilities.sum(axis=-1, keepdims=True)
+
+
+def _labelled_arrays(names, examples):
+    embeddings = np.vstack([embedding for _, _, embedding in examples])
+    labels = np.array([names.index(category) for _, category, _ in examples])
+    return embeddings, labels
+
+
+def calibrate_temperature(names, centroids, examples):
+    """Pick the softmax temperature with the lowest negative log-likelihood on the given examples"""
+    embeddings, labels = _labelled_arrays(names, examples)
+    losses = [
+        -np.log(_probabilities(centroids, embeddings, temperature)[np.arange(len(labels)), labels] + 1e-12).mean()
+        for temperature in TEMPERATURES
+    ]
+    return float(TEMPERATURES[int(np.argmin(losses))])
+
+
+def train_fast_path(categories, examples):
+    """
+    Calibrate the temperature on the calibration split and build the serving centroids from the rest.
+    Returns None when there is not enough feedback to calibrate.
+    """
+    calibration = [example for example in examples if _split(example[0]) == "calibration"]
+    rest = [example for example in examples if _split(example[0]) != "calibration"]
+    if len(calibration) < MIN_CALIBRATION_EXAMPLES:
+        return None
+    names, centroids = build_centroids(categories, rest)
+    return {"categories": names, "centroids": centroids, "temperature": calibrate_temperature(names, centroids, calibration)}
+
+
+def _fresh_model(key):
+    with _lock:
+        cached = _models.get(key)
+        if cached and time.time() - cached["trained_at"] < RETRAIN_INTERVAL_SECONDS:
+            return cached
+    return None
+
+
+def get_fast_path_model(categories, use_feedback=False):
+    """
+    Return the model for a category set, retrained when feedback changed and the last training is stale.
+    Training runs outside _lock and the finished model is swapped in, so classification and stats
+    never wait for it; while one thread retrains, the others keep using the previous model.
+    """
+    key = tuple(categories)
+    fresh = _fresh_model(key)
+    if fresh:
+        return fresh["model"]
+    with _lock:
+        cached = _models.get(key)
+    if not _train_lock.acquire(blocking=cached is None):
+        return cached["model"]
+    try:
+        fresh = _fresh_model(key)  # trained by the thread we waited for
+        if fresh:
+            return fresh["model"]
+        signature = (count_corrections(), feedback_version() if use_feedback else None)
+        if cached and cached["signature"] == signature:
+            model = cached["model"]
+        else:
+            model = train_fast_path(categories, load_labelled_examples(categories, use_feedback))
+        with _lock:
+            _models[key] = {"model": model, "signature": signature, "trained_at": time.time()}
+        return model
+    finally:
+        _train_lock.release()
+
+
+def classify_locally(text, categories, use_feedback=False, threshold=FAST_PATH_THRESHOLD):
+    """
+    Classify a document from its embedding alone.
+    Returns a classification when the calibrated confidence reaches threshold, otherwise None
+    so the caller escalates to the LLM.
+    """
+    try:
+        model = get_fast_path_model(categories, use_feedback)
+        if model is None:
+            return None
+        probabilities = _probabilities(model["centroids"], embed_text(text)[None, :], model["temperature"])[0]
+    except Exception:
+        logger.exception("Local pre-classification failed; escalating to the LLM")
+        return None
+    ranking = np.argsort(probabilities)[::-1]
+    confidence = float(probabilities[ranking[0]])
+    with _lock:
+        FAST_PATH_STATS["local" if confidence >= threshold else "escalated"] += 1
+    if confidence < threshold:
+        return None
+    return {
+        "category": model["categories"][ranking[0]],
+        "confidence": confidence,
+        "alternative_categories": [model["categories"][i] for i in ranking[1:3]],
+        "explanation": "Classified locally: the document closely matches previously confirmed documents of this category.",
+        "source": "local",
+    }
+
+
+def get_fast_path_stats():
+    """Return how many documents were answered locally and how many went to the LLM"""
+    with _lock:
+        stats = dict(FAST_PATH_STATS)
+    total = stats["local"] + stats["escalated"]
+    stats["local_ratio"] = stats["local"] / total if total else 0.0
+    return stats
+
+
+def fast_path_report(categories, use_feedback=False, thresholds=REPORT_THRESHOLDS):
+    """
+    Evaluate routing on the held-out test split: centroids from the train split,
+    temperature from the calibration split. For each threshold, report the share of test
+    documents answered locally and the accuracy of those answers.
+    """
+    examples = load_labelled_examples(categories, use_feedback)
+    splits = {"train": [], "calibration": [], "test": []}
+    for example in examples:
+        splits[_split(example[0])].append(example)
+    report = {name: len(split) for name, split in splits.items()}
+    if not splits["calibration"] or not splits["test"]:
+        report["rows"] = []
+        return report
+
+    names, centroids = build_centroids(categories, splits["train"])
+    temperature = calibrate_temperature(names, centroids, splits["calibration"])
+    embeddings, labels = _labelled_arrays(names, splits["test"])
+    probabilities = _probabilities(centroids, embeddings, temperature)
+    confidences = probabilities.max(axis=1)
+    correct = probabilities.argmax(axis=1) == labels
+
+    report["temperature"] = temperature
+    report["overall_accuracy"] = float(correct.mean())
+    report["rows"] = []
+    for threshold in thresholds:
+        routed = confidences >= threshold
+        report["rows"].append({
+            "threshold": threshold,
+            "local_ratio": float(routed.mean()),
+            "local_accuracy": float(correct[routed].mean()) if routed.any() else None,
+        })
+    return report
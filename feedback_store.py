@@ -0,0 +1,197 @@
+import csv
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+
+# Classification feedback: one row per filed or corrected document
+FEEDBACK_DB = "feedback.db"
+EXPORT_BATCH_ROWS = 50000
+
+_imported_files = set()
+
+
+def _connect():
+    conn = sqlite3.connect(FEEDBACK_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")  # readers never block the upload path's writes
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS feedback (
+            id INTEGER PRIMARY KEY,
+            text TEXT NOT NULL,
+            text_hash TEXT NOT NULL,
+            predicted_category TEXT,
+            confidence REAL,
+            user_feedback TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_category ON feedback (user_feedback)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_timestamp ON feedback (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_text_hash ON feedback (text_hash)")
+    # Per-category aggregates kept up to date on insert, so stats never scan the feedback table
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS feedback_category_stats (
+            category TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            corrections INTEGER NOT NULL,
+            confidence_sum REAL NOT NULL,
+            confidence_count INTEGER NOT NULL
+        )"""
+    )
+    conn.execute(
+        """CREATE TRIGGER IF NOT EXISTS feedback_category_stats_insert AFTER INSERT ON feedback BEGIN
+            INSERT INTO feedback_category_stats (category, count, corrections, confidence_sum, confidence_count)
+            VALUES (NEW.user_feedback, 1, NEW.predicted_category IS NOT NEW.user_feedback,
+                    COALESCE(NEW.confidence, 0), NEW.confidence IS NOT NULL)
+            ON CONFLICT (category) DO UPDATE SET
+                count = count + 1,
+                corrections = corrections + excluded.corrections,
+                confidence_sum = confidence_sum + excluded.confidence_sum,
+                confidence_count = confidence_count + excluded.confidence_count;
+        END"""
+    )
+    return conn
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _row(text, predicted_category, confidence, actual_category, timestamp=None):
+    return (
+        text,
+        text_hash(text),
+        predicted_category,
+        None if confidence is None else float(confidence),
+        actual_category,
+        timestamp or datetime.now().isoformat(sep=" "),
+    )
+
+
+def save_feedback_batch(rows):
+    """Insert many (text, predicted_category, confidence, actual_category) rows in one transaction"""
+    records = [_row(*row) for row in rows]
+    if not records:
+        return 0
+    with _connect() as conn:
+        conn.executemany(
+            """INSERT INTO feedback (text, text_hash, predicted_category, confidence, user_feedback, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?)""",
+            records,
+        )
+    return len(records)
+
+
+def save_feedback(text, predicted_category, confidence, actual_category):
+    """Record the category a document was filed under, with the prediction it started from"""
+    save_feedback_batch([(text, predicted_category, confidence, actual_category)])
+
+
+def recent_feedback(limit=20):
+    """Return the newest feedback rows, newest first, without their document text"""
+    with _connect() as conn:
+        rows = conn.execute(
+            """SELECT id, text_hash, predicted_category, confidence, user_feedback, timestamp
+            FROM feedback ORDER BY id DESC LIMIT ?""",
+            (limit,),
+        ).fetchall()
+    keys = ("id", "text_hash", "predicted_category", "confidence", "user_feedback", "timestamp")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def feedback_stats():
+    """Per-category row counts, corrections (prediction overridden) and mean confidence"""
+    with _connect() as conn:
+        rows = conn.execute(
+            """SELECT category, count, corrections, confidence_sum / NULLIF(confidence_count, 0)
+            FROM feedback_category_stats ORDER BY count DESC"""
+        ).fetchall()
+    return {
+        category: {"count": count, "corrections": corrections, "mean_confidence": mean_confidence}
+        for category, count, corrections, mean_confidence in rows
+    }
+
+
+def feedback_version():
+    """A value that changes whenever feedback is added, for callers that cache derived data"""
+    with _connect() as conn:
+        return conn.execute("SELECT MAX(id) FROM feedback").fetchone()[0]
+
+
+def iter_feedback(categories=None, limit=None):
+    """Yield (text, user_feedback) pairs, optionally only for the given categories; limit keeps the most recent rows"""
+    where, params = "", []
+    if categories is not None:
+        params = list(categories)
+        where = f"WHERE user_feedback IN ({','.join('?' * len(params))})"
+    if limit is None:
+        query = f"SELECT text, user_feedback FROM feedback {where} ORDER BY id"
+    else:
+        query = f"SELECT text, user_feedback FROM (SELECT id, text, user_feedback FROM feedback {where} ORDER BY id DESC LIMIT ?) ORDER BY id"
+        params.append(int(limit))
+    conn = _connect()
+    try:
+        yield from conn.execute(query, params)
+    finally:
+        conn.close()
+
+
+def export_parquet(path):
+    """Write the whole feedback table to a Parquet file in batches; needs pyarrow"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("text", pa.string()),
+        ("text_hash", pa.string()),
+        ("predicted_category", pa.string()),
+        ("confidence", pa.float64()),
+        ("user_feedback", pa.string()),
+        ("timestamp", pa.string()),
+    ])
+    exported = 0
+    conn = _connect()
+    try:
+        cursor = conn.execute(
+            "SELECT id, text, text_hash, predicted_category, confidence, user_feedback, timestamp FROM feedback ORDER BY id"
+        )
+        with pq.ParquetWriter(path, schema) as writer:
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_ROWS)
+                if not rows:
+                    break
+                columns = list(zip(*rows))
+                writer.write_table(pa.table(
+                    {field.name: pa.array(column, type=field.type) for field, column in zip(schema, columns)},
+                    schema=schema,
+                ))
+                exported += len(rows)
+    finally:
+        conn.close()
+    return exported
+
+
+def import_legacy_csv(csv_file):
+    """One-off import of learning_data.csv into an empty feedback store"""
+    if csv_file in _imported_files:
+        return 0
+    _imported_files.add(csv_file)
+    if not os.path.exists(csv_file):
+        return 0
+    with _connect() as conn:
+        if conn.execute("SELECT 1 FROM feedback LIMIT 1").fetchone():
+            return 0
+    with open(csv_file, newline="", encoding="utf-8") as f:
+        rows = [
+            _row(row["text"], row["predicted_category"], row["confidence"] or None, row["user_feedback"], row["timestamp"])
+            for row in csv.DictReader(f)
+        ]
+    with _connect() as conn:
+        conn.executemany(
+            """INSERT INTO feedback (text, text_hash, predicted_category, confidence, user_feedback, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?)""",
+            rows,
+        )
+    return len(rows)
@@ -0,0 +1,140 @@
+import json
+
+import faiss
+import numpy as np
+
+CHARS_PER_TOKEN = 4  # rough estimate, good enough for budgeting
+EXAMPLES_PER_RULE = 1
+KEYWORD_LISTS_PER_DOCUMENT = 3
+FEW_SHOT_EXAMPLES_PER_DOCUMENT = 1
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def load_prompt_corpus(path):
+    """Load the structured instructions and examples of the classifier prompt"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _render_keyword_list(keyword_list):
+    return (
+        f"- {keyword_list['category']}:\n"
+        f"    Keywords: {json.dumps(keyword_list['keywords'], ensure_ascii=False)}\n"
+        f"    - *Example Phrases:* {keyword_list['example_phrases']}"
+    )
+
+
+def _render_few_shot(example):
+    output = json.dumps(example["output"], ensure_ascii=False, indent=3)
+    return f"- *{example['label']}:*\n  {example['description']}\n  *Expected Output:*\n  {output}"
+
+
+def _corpus_entries(corpus):
+    """Flatten the retrievable examples into (group, text to embed, text to render) entries"""
+    entries = []
+    for step in corpus["steps"]:
+        for rule in step["rules"]:
+            for example in rule["examples"]:
+                entries.append((rule["id"], example, example))
+    for keyword_list in corpus["keyword_lists"]:
+        rendered = _render_keyword_list(keyword_list)
+        entries.append(("keywords", rendered, rendered))
+    for example in corpus["few_shot_examples"]:
+        entries.append(("few_shot", example["description"], _render_few_shot(example)))
+    return entries
+
+
+def build_example_index(encode, corpus):
+    """
+    Embed every corpus example once and index the embeddings for cosine similarity search.
+    encode maps a list of texts to an array of normalized embeddings.
+    """
+    entries = _corpus_entries(corpus)
+    embeddings = encode([embed_text for _, embed_text, _ in entries])
+    index = faiss.IndexFlatIP(embeddings.shape[1])
+    index.add(np.asarray(embeddings, dtype=np.float32))
+    return index, entries
+
+
+def select_examples(encode, example_index, text, token_budget):
+    """
+    Pick the examples most similar to the document, at most a few per rule,
+    in order of similarity until the token budget is used up.
+    """
+    index, entries = example_index
+    query = np.asarray(encode([text]), dtype=np.float32)
+    _, ranking = index.search(query, index.ntotal)
+
+    limits = {"keywords": KEYWORD_LISTS_PER_DOCUMENT, "few_shot": FEW_SHOT_EXAMPLES_PER_DOCUMENT}
+    counts = {}
+    selected = set()
+    used = 0
+    for position in ranking[0]:
+        group, _, rendered = entries[position]
+        if counts.get(group, 0) >= limits.get(group, EXAMPLES_PER_RULE):
+            continue
+        cost = estimate_tokens(rendered)
+        if used + cost > token_budget:
+            continue
+        selected.add(rendered)
+        counts[group] = counts.get(group, 0) + 1
+        used += cost
+    return selected
+
+
+def render_instructions(corpus):
+    """Render every step and rule instruction; this part is identical for all documents"""
+    lines = [corpus["preamble"], ""]
+    for step in corpus["steps"]:
+        lines.append(f"{step['title']}:")
+        lines.extend(f"   {line}" for line in step["instructions"])
+        for rule in step["rules"]:
+            lines.append(f"   {rule['id'][-1]}. **{rule['name']}:**")
+            lines.extend(f"      {line}" for line in rule["instructions"])
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _render_examples(corpus, selected):
+    lines = []
+    for step in corpus["steps"]:
+        for rule in step["rules"]:
+            examples = [example for example in rule["examples"] if example in selected]
+            if examples:
+                lines.append(f"{rule['id']}. {rule['name']}:")
+                lines.extend(f"   - *Example:* {example}" for example in examples)
+    keyword_lists = [rendered for rendered in map(_render_keyword_list, corpus["keyword_lists"]) if rendered in selected]
+    if keyword_lists:
+        lines.append("2. Keyword lists:")
+        lines.extend(f"   {line}" for rendered in keyword_lists for line in rendered.splitlines())
+    few_shot = [rendered for rendered in map(_render_few_shot, corpus["few_shot_examples"]) if rendered in selected]
+    if few_shot:
+        lines.append("10. Few-Shot Examples (Ambiguous and Confusing Cases):")
+        lines.extend(f"    {line}" for rendered in few_shot for line in rendered.splitlines())
+    return "\n".join(lines)
+
+
+def build_classifier_prompt(corpus, example_index, encode, text, correction_context, token_budget):
+    """
+    Assemble the classifier prompt as (instructions, document prompt).
+    The instructions cover every rule and never change, so they can be cached by the provider;
+    the document prompt carries the examples most similar to the document that fit in the
+    remaining token budget, the correction context and the document itself.
+    """
+    instructions = render_instructions(corpus)
+    remaining = token_budget - estimate_tokens(instructions)
+    selected = select_examples(encode, example_index, text, remaining) if remaining > 0 else set()
+    document_prompt = f"""Examples relevant to this document:
+{_render_examples(corpus, selected)}
+
+11. Learning from Corrections:
+    {correction_context}
+
+---
+**Now, classify this document:**
+{text}
+"""
+    return instructions, document_prompt
@@ -0,0 +1,318 @@
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+# Deterministic extraction of the strictly formatted invoice fields, with German and English labels.
+# Fields are found in one pass of a single compiled regex over all labels, then validated.
+FIELD_LABELS = {
+    "Invoice Number": ["Rechnungsnummer", "Rechnungs-Nr.", "Rechnungsnr.", "Rechnung Nr.", "Invoice Number",
+                       "Invoice No.", "Invoice No", "Invoice #"],
+    "Invoice Date": ["Rechnungsdatum", "Invoice Date", "Datum", "Date"],
+    "Order Number": ["Bestellnummer", "Bestell-Nr.", "Auftragsnummer", "Auftrags-Nr.", "Order Number", "Order No.",
+                     "PO Number", "Purchase Order No."],
+    "VAT ID": ["USt-IdNr.", "USt-IdNr", "USt.-IdNr.", "USt-Id-Nr.", "USt-ID", "UStIdNr", "Umsatzsteuer-ID", "VAT ID",
+               "VAT No.", "VAT Reg. No.", "VAT Number"],
+    "IBAN": ["IBAN"],
+    "Payment Reference": ["Zahlungsreferenz", "Verwendungszweck", "Payment Reference"],
+}
+AMOUNT_LABELS = {
+    "net_amount": ["Nettobetrag", "Summe netto", "Zwischensumme", "Netto", "Net Amount", "Subtotal", "Net"],
+    "tax_amount": ["Umsatzsteuer", "Mehrwertsteuer", "MwSt.", "MwSt", "USt.", "USt", "VAT Amount", "VAT", "Tax"],
+    "total_amount": ["Gesamtbetrag", "Rechnungsbetrag", "Bruttobetrag", "Gesamtsumme", "Brutto", "Total Amount",
+                     "Amount Due", "Total"],
+}
+# Labels this generic are often something else (delivery date, net weight), so their values get medium confidence
+GENERIC_LABELS = {"datum", "date", "netto", "net", "tax", "total", "brutto"}
+# A generic label after one of these words belongs to another field ("Due Date", "Order Date", "Liefer Datum")
+QUALIFYING_PREFIXES = ("due", "order", "delivery", "shipping", "payment", "service", "fällig", "liefer", "bestell",
+                       "leistungs", "zahlungs")
+
+COMPLETE_FIELDS = ("Invoice Number", "Invoice Date", "VAT ID")  # with reconciled amounts, the LLM adds nothing needed
+AMOUNT_TOLERANCE = Decimal("0.01")
+MAX_PAYMENT_REFERENCE = 140  # SEPA remittance information limit
+
+IBAN_LENGTHS = {
+    "AT": 20, "BE": 16, "CH": 21, "CZ": 24, "DE": 22, "DK": 18, "ES": 24, "FI": 18, "FR": 27, "GB": 22,
+    "IE": 22, "IT": 27, "LI": 21, "LU": 20, "NL": 18, "NO": 15, "PL": 28, "PT": 25, "SE": 24,
+}
+VAT_PATTERNS = {
+    "AT": r"U\d{8}", "BE": r"[01]\d{9}", "BG": r"\d{9,10}", "CY": r"\d{8}[A-Z]", "CZ": r"\d{8,10}", "DE": r"\d{9}",
+    "DK": r"\d{8}", "EE": r"\d{9}", "EL": r"\d{9}", "ES": r"[A-Z0-9]\d{7}[A-Z0-9]", "FI": r"\d{8}",
+    "FR": r"[A-HJ-NP-Z0-9]{2}\d{9}", "HR": r"\d{11}", "HU": r"\d{8}", "IE": r"\d{7}[A-W][A-I]?|\d[A-Z+*]\d{5}[A-W]",
+    "IT": r"\d{11}", "LT": r"\d{9}|\d{12}", "LU": r"\d{8}", "LV": r"\d{11}", "MT": r"\d{8}", "NL": r"\d{9}B\d{2}",
+    "PL": r"\d{10}", "PT": r"\d{9}", "RO": r"\d{2,10}", "SE": r"\d{12}", "SI": r"\d{8}", "SK": r"\d{10}",
+    "GB": r"\d{9}|\d{12}|GD\d{3}|HA\d{3}",
+}
+_VAT_REGEXES = {country: re.compile(pattern) for country, pattern in VAT_PATTERNS.items()}
+
+CURRENCIES = {"€": "EUR", "EUR": "EUR", "$": "USD", "USD": "USD", "£": "GBP", "GBP": "GBP", "CHF": "CHF"}
+MONTHS = {
+    "januar": 1, "january": 1, "februar": 2, "february": 2, "märz": 3, "maerz": 3, "march": 3, "april": 4,
+    "mai": 5, "may": 5, "juni": 6, "june": 6, "juli": 7, "july": 7, "august": 8, "september": 9,
+    "oktober": 10, "october": 10, "november": 11, "dezember": 12, "december": 12,
+}
+DATE_FORMATS = ("%d.%m.%Y", "%d.%m.%y", "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y")
+
+
+def _label_group(labels):
+    # Longest first, so "USt-IdNr." wins over "USt" and "VAT ID" over "VAT" at the same position
+    return "|".join(re.escape(label) for label in sorted(labels, key=len, reverse=True))
+
+
+def _build_label_index():
+    index = {}
+    for field, labels in FIELD_LABELS.items():
+        for label in labels:
+            index.setdefault(label.lower(), ("field", field))
+    for key, labels in AMOUNT_LABELS.items():
+        for label in labels:
+            index.setdefault(label.lower(), ("amount", key))
+    return index
+
+
+_LABEL_INDEX = _build_label_index()
+_LABEL_PATTERN = re.compile(
+    rf"(?<![\w-])(?P<label>{_label_group(_LABEL_INDEX)})(?!\w)[ \t]*(?:\([^)\n]*\))?[ \t]*[:#]?[ \t]*(?=(?P<rest>[^\n]*))"
+    r"|(?<![A-Z0-9])(?P<iban>[A-Z]{2}\d{2}(?: ?[A-Z0-9]){11,32})",
+    re.IGNORECASE,
+)
+_REFERENCE_NUMBER = re.compile(r"(?=[A-Z0-9./_-]*\d)[A-Z0-9][A-Z0-9./_-]{2,30}", re.IGNORECASE)
+_VAT_CANDIDATE = re.compile(r"[A-Z]{2}[A-Z0-9 .+*-]{2,17}", re.IGNORECASE)
+_DATE_CANDIDATE = re.compile(
+    r"\d{1,2}\.\d{1,2}\.\d{2,4}|\d{4}-\d{2}-\d{2}|\d{1,2}[/-]\d{1,2}[/-]\d{4}|\d{1,2}\.? ?[A-Za-zä]+ \d{4}"
+)
+_AMOUNT = re.compile(
+    r"(?P<before>€|\$|£|EUR|USD|GBP|CHF)?\s*"
+    r"(?P<amount>-?\d{1,3}(?:[.,' ]\d{3})+(?:[.,]\d{1,2})?|-?\d+(?:[.,]\d{1,2})?)(?![\d%])\s*"
+    r"(?P<after>€|\$|£|EUR|USD|GBP|CHF)?"
+)
+_PAYMENT_TERM = re.compile(r"\s*(?:Tage|Tagen|days?)\b", re.IGNORECASE)  # "Netto 30 Tage", "Net 30 days"
+_RATE = re.compile(r"^[^\d\n]*\d{1,2}(?:[.,]\d+)?\s*%")
+_QUALIFIED = re.compile(rf"(?:{'|'.join(QUALIFYING_PREFIXES)})\w*[ \t.-]*$", re.IGNORECASE)
+
+
+def iban_is_valid(iban):
+    """ISO 13616 check: move the first four characters to the end, map letters to numbers, and require mod 97 == 1"""
+    iban = iban.replace(" ", "").upper()
+    if not re.fullmatch(r"[A-Z]{2}\d{2}[A-Z0-9]{11,30}", iban):
+        return False
+    if iban[:2] in IBAN_LENGTHS and len(iban) != IBAN_LENGTHS[iban[:2]]:
+        return False
+    return int("".join(str(int(char, 36)) for char in iban[4:] + iban[:4])) % 97 == 1
+
+
+def _match_iban(candidate):
+    """Return the valid IBAN at the start of candidate, which may run on into the following text"""
+    compact = candidate.replace(" ", "").upper()
+    lengths = [IBAN_LENGTHS[compact[:2]]] if compact[:2] in IBAN_LENGTHS else range(min(len(compact), 34), 14, -1)
+    for length in lengths:
+        iban = compact[:length]
+        if iban_is_valid(iban):
+            return " ".join(iban[i:i + 4] for i in range(0, length, 4))
+    return None
+
+
+def _german_vat_check_digit_ok(digits):
+    """ISO 7064 MOD 11,10 check digit used by German USt-IdNr."""
+    product = 10
+    for digit in digits[:8]:
+        total = (int(digit) + product) % 10 or 10
+        product = (2 * total) % 11
+    return (11 - product) % 10 == int(digits[8])
+
+
+def vat_id_is_valid(vat_id):
+    """Check an EU VAT ID against its country's format, and the check digit where it is public (DE)"""
+    vat_id = re.sub(r"[\s.-]", "", vat_id).upper()
+    country, number = vat_id[:2], vat_id[2:]
+    regex = _VAT_REGEXES.get(country)
+    if regex is None or not regex.fullmatch(number):
+        return False
+    return country != "DE" or _german_vat_check_digit_ok(number)
+
+
+def _match_vat_id(rest):
+    candidate = _VAT_CANDIDATE.match(rest)
+    if not candidate:
+        return None
+    # The candidate may run into following words; try the longest prefix that validates
+    compact = re.sub(r"[\s.-]", "", candidate.group()).upper()
+    for length in range(len(compact), 3, -1):
+        if vat_id_is_valid(compact[:length]):
+            return compact[:length]
+    return None
+
+
+def _match_date(rest):
+    candidate = _DATE_CANDIDATE.match(rest)
+    if not candidate:
+        return None
+    value = candidate.group()
+    named = re.fullmatch(r"(\d{1,2})\.? ?([A-Za-zä]+) (\d{4})", value)
+    if named:
+        month = MONTHS.get(named.group(2).lower())
+        try:
+            return value if month and datetime(int(named.group(3)), month, int(named.group(1))) else None
+        except ValueError:
+            return None
+    for date_format in DATE_FORMATS:
+        try:
+            datetime.strptime(value, date_format)
+            return value
+        except ValueError:
+            continue
+    return None
+
+
+def parse_amount(text):
+    """Parse a German or English formatted amount ("1.234,56", "1,234.56", "1 234,5") into a Decimal"""
+    text = text.replace(" ", "").replace("'", "")
+    if "," in text and "." in text:
+        decimal_separator = "," if text.rfind(",") > text.rfind(".") else "."
+    elif "," in text:
+        decimal_separator = "," if re.search(r",\d{1,2}$", text) else None
+    else:
+        decimal_separator = "." if re.search(r"\.\d{1,2}$", text) else None
+    thousands_separator = {",": ".", ".": ","}.get(decimal_separator, ",.")
+    for separator in thousands_separator:
+        text = text.replace(separator, "")
+    if decimal_separator:
+        text = text.replace(decimal_separator, ".")
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+
+def _match_amount(rest):
+    rate = _RATE.match(rest)  # "MwSt 19 %: 19,00 €" - skip the rate, keep the amount
+    if rate:
+        rest = rest[rate.end():]
+    rest = rest.lstrip(" \t:=")
+    match = _AMOUNT.match(rest)
+    if not match or _PAYMENT_TERM.match(rest, match.end("amount")):
+        return None, None
+    symbol = match.group("before") or match.group("after")
+    return parse_amount(match.group("amount")), CURRENCIES.get(symbol.upper()) if symbol else None
+
+
+def _match_field(field, rest):
+    if field == "Invoice Date":
+        return _match_date(rest)
+    if field == "VAT ID":
+        return _match_vat_id(rest)
+    if field == "IBAN":
+        return _match_iban(rest)
+    if field == "Payment Reference":
+        value = rest.strip()[:MAX_PAYMENT_REFERENCE]
+        return value or None
+    match = _REFERENCE_NUMBER.match(rest)
+    return match.group() if match else None
+
+
+def _next_line(text, position):
+    end = text.find("\n", position + 1)
+    return text[position + 1:end if end != -1 else len(text)]
+
+
+def extract_invoice_fields(text):
+    """
+    Extract the strictly formatted invoice fields locally.
+    Returns {"extracted_fields", "amounts", "amount_confidence", "validation_warnings"} in the
+    extraction JSON shape; every field carries "source": "rules". The first valid value of each
+    field or amount wins, except that a specific label ("Rechnungsdatum", "Nettobetrag") overrides
+    a generic one ("Datum", "Netto"); generic labels qualified by a preceding word ("Due Date",
+    "Order Date") are skipped. Values found under generic labels have "medium" confidence.
+    """
+    fields = {}
+    amounts = {}
+    amount_confidence = {}
+    currencies = set()
+    for match in _LABEL_PATTERN.finditer(text):
+        if match.group("iban"):
+            iban = _match_iban(match.group("iban"))
+            if iban and "IBAN" not in fields:
+                fields["IBAN"] = {"field_name": "IBAN", "original_label": "IBAN", "value": iban, "confidence": "high"}
+            continue
+        label = match.group("label")
+        kind, name = _LABEL_INDEX[label.lower()]
+        rest = match.group("rest")
+        generic = label.lower() in GENERIC_LABELS
+        if generic and _QUALIFIED.search(text, max(0, match.start() - 30), match.start()):
+            continue
+        if kind == "field":
+            if name in fields and (generic or fields[name]["confidence"] == "high"):
+                continue
+            value = _match_field(name, rest) or (None if rest.strip() else _match_field(name, _next_line(text, match.end())))
+            if value:
+                confidence = "medium" if generic else "high"
+                fields[name] = {"field_name": name, "original_label": label, "value": value, "confidence": confidence}
+        elif name not in amounts or (not generic and amount_confidence[name] == "medium"):
+            amount, currency = _match_amount(rest)
+            if amount is not None:
+                amounts[name] = amount
+                amount_confidence[name] = "medium" if generic else "high"
+                if currency:
+                    currencies.add(currency)
+
+    warnings = []
+    if len(currencies) > 1:
+        warnings.append(f"Several currencies found: {', '.join(sorted(currencies))}")
+    result_amounts = {key: str(value) for key, value in amounts.items()}
+    if len(currencies) == 1:
+        result_amounts["currency"] = currencies.pop()
+    return {
+        "extracted_fields": [dict(field, source="rules") for field in fields.values()],
+        "amounts": result_amounts,
+        "amount_confidence": amount_confidence,
+        "validation_warnings": warnings,
+    }
+
+
+def amounts_reconcile(amounts):
+    """True when net, tax and total were all found and net + tax equals total"""
+    try:
+        net, tax, total = (Decimal(amounts[key]) for key in ("net_amount", "tax_amount", "total_amount"))
+    except (KeyError, InvalidOperation):
+        return False
+    return abs(net + tax - total) <= AMOUNT_TOLERANCE
+
+
+def rules_are_complete(rules):
+    """
+    True when the rules found every field the LLM would be asked for that matters for booking the invoice.
+    Fields found under a generic label ("Datum") do not count, since they may belong to another field.
+    """
+    found = {field["field_name"] for field in rules["extracted_fields"] if field["confidence"] == "high"}
+    return all(field in found for field in COMPLETE_FIELDS) and amounts_reconcile(rules["amounts"])
+
+
+def merge_extractions(rules, llm_result):
+    """
+    Combine rule and LLM extractions into one result in the extraction JSON shape.
+    Rule values are validated, so they win over LLM values for the same field or amount, except
+    those found under a generic label (medium confidence); every extracted field and amount is
+    labelled with its source in "source" / "amount_sources".
+    """
+    llm_result = llm_result or {}
+    llm_fields = [dict(field, source="llm") for field in llm_result.get("extracted_fields") or [] if isinstance(field, dict)]
+    llm_names = {str(field.get("field_name", "")).lower() for field in llm_fields if field.get("value")}
+    fields = [field for field in rules["extracted_fields"]
+              if field["confidence"] == "high" or field["field_name"].lower() not in llm_names]
+    rule_names = {field["field_name"].lower() for field in fields}
+    fields += [field for field in llm_fields if str(field.get("field_name", "")).lower() not in rule_names]
+    amounts = dict(llm_result.get("amounts") or {})
+    amount_sources = {key: "llm" for key, value in amounts.items() if value}
+    for key, value in rules["amounts"].items():
+        if rules["amount_confidence"].get(key) == "medium" and amounts.get(key):
+            continue
+        amounts[key] = value
+        amount_sources[key] = "rules"
+    return {
+        "document_type": llm_result.get("document_type", "Invoice"),
+        "extracted_fields": fields,
+        "amounts": amounts,
+        "amount_sources": amount_sources,
+        "line_items": [dict(item, source="llm") for item in llm_result.get("line_items") or [] if isinstance(item, dict)],
+        "validation_warnings": rules["validation_warnings"] + list(llm_result.get("validation_warnings") or []),
+    }
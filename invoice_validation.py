@@ -0,0 +1,141 @@
+import re
+from decimal import Decimal, ROUND_HALF_UP
+
+from invoice_rules import parse_amount
+
+# Local arithmetic checks of extracted invoice amounts and line items
+ROUNDING_TOLERANCE = Decimal("0.01")
+UNIT_ROUNDING = Decimal("0.005")  # unit prices are rounded to the cent, so totals may drift by this per unit
+# Standard and reduced VAT rates (percent) in the countries we receive invoices from
+STANDARD_VAT_RATES = tuple(Decimal(rate) for rate in
+                           ("0", "2.6", "3.8", "5", "7", "8.1", "10", "13", "16", "19", "20", "21", "22", "25"))
+CENT = Decimal("0.01")
+AMOUNT_KEYS = ("net_amount", "tax_amount", "total_amount")
+LINE_ITEM_KEYS = ("quantity", "unit_price_net", "total_price")
+
+_NUMBER = re.compile(r"-?\d(?:[\d.,' ]*\d)?")
+
+
+def parse_money(value):
+    """Parse an amount or quantity ("1.234,56 €", "EUR 99.90", "10 Stk.", 12.5) into a Decimal, or None"""
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return Decimal(str(value))
+    if not isinstance(value, str):
+        return None
+    match = _NUMBER.search(value)
+    return parse_amount(match.group()) if match else None
+
+
+def _cents(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _issue(fields, message, recheck=True):
+    return {"fields": fields, "message": message, "recheck": recheck}
+
+
+def _matches_gross(net, total, rate):
+    """True when total is net plus VAT at the invoice's own rate (some invoices list gross line totals)"""
+    return rate is not None and abs(_cents(net * (1 + rate)) - total) <= ROUNDING_TOLERANCE
+
+
+def validate_amounts(extraction):
+    """
+    Check the arithmetic of an extraction: quantity x unit price = line total, line totals sum to
+    the net amount, net + tax = total, and tax is a standard VAT rate of net.
+    Returns a list of issues {"fields", "message", "recheck"}; fields are paths such as
+    "amounts.tax_amount" or "line_items.2.total_price", and recheck marks issues worth a
+    targeted re-extraction (a mixed-rate tax amount, for example, is only reported).
+    """
+    issues = []
+    amounts = extraction.get("amounts") or {}
+    parsed = {}
+    for key in AMOUNT_KEYS:
+        if amounts.get(key) in (None, ""):
+            continue
+        parsed[key] = parse_money(amounts[key])
+        if parsed[key] is None:
+            label = key.replace("_", " ").capitalize()
+            issues.append(_issue([f"amounts.{key}"], f"{label} '{amounts[key]}' is not a number"))
+    net, tax, total = (parsed.get(key) for key in AMOUNT_KEYS)
+    rate = tax / net if net and tax is not None else None
+
+    line_totals = []
+    for i, item in enumerate(extraction.get("line_items") or []):
+        values = {key: parse_money(item.get(key)) for key in LINE_ITEM_KEYS}
+        description = item.get("description") or f"Line item {i + 1}"
+        if values["total_price"] is None:
+            issues.append(_issue(
+                [f"line_items.{i}.total_price"], f"{description}: total price is missing or not a number"
+            ))
+            line_totals = None
+            continue
+        if line_totals is not None:
+            line_totals.append(values["total_price"])
+        quantity, unit_price, line_total = values["quantity"], values["unit_price_net"], values["total_price"]
+        if quantity is None or unit_price is None:
+            continue
+        expected = quantity * unit_price
+        tolerance = ROUNDING_TOLERANCE + abs(quantity) * UNIT_ROUNDING
+        if abs(expected - line_total) > tolerance and not _matches_gross(expected, line_total, rate):
+            issues.append(_issue(
+                [f"line_items.{i}.{key}" for key in LINE_ITEM_KEYS],
+                f"{description}: {quantity} x {unit_price} = {_cents(expected)}, but the line total is {line_total}",
+            ))
+
+    if line_totals and net is not None:
+        line_sum = sum(line_totals)
+        # Line totals may be listed gross, in which case they add up to the total, or to net + tax
+        sums_up = any(abs(line_sum - amount) <= ROUNDING_TOLERANCE for amount in (net, total) if amount is not None)
+        if not sums_up and not _matches_gross(net, line_sum, rate):
+            issues.append(_issue(
+                ["amounts.net_amount"] + [f"line_items.{i}.total_price" for i in range(len(line_totals))],
+                f"Line items sum to {line_sum}, but the net amount is {net}",
+            ))
+    if net is not None and tax is not None and total is not None:
+        if abs(net + tax - total) > ROUNDING_TOLERANCE:
+            issues.append(_issue(
+                [f"amounts.{key}" for key in AMOUNT_KEYS],
+                f"Net {net} plus tax {tax} is {net + tax}, but the total is {total}",
+            ))
+        elif net and not any(abs(_cents(net * rate / 100) - tax) <= ROUNDING_TOLERANCE for rate in STANDARD_VAT_RATES):
+            issues.append(_issue(
+                ["amounts.tax_amount"],
+                f"Tax is {_cents(tax / net * 100)}% of net, not a standard VAT rate (mixed rates?)",
+                recheck=False,
+            ))
+    return issues
+
+
+def fields_to_recheck(issues):
+    """The sorted field paths of every issue worth a re-extraction"""
+    return sorted({field for issue in issues if issue["recheck"] for field in issue["fields"]})
+
+
+def apply_corrections(extraction, corrections, fields, source="llm_recheck"):
+    """
+    Write re-extracted values into an extraction, for the requested field paths only.
+    corrections is {"amounts": {key: value}, "line_items": [{"index": i, key: value}]}.
+    """
+    corrections = corrections if isinstance(corrections, dict) else {}
+    fields = set(fields)
+    amounts = extraction.setdefault("amounts", {})
+    amount_sources = extraction.setdefault("amount_sources", {})
+    for key, value in (corrections.get("amounts") or {}).items():
+        if f"amounts.{key}" in fields and value not in (None, ""):
+            amounts[key] = value
+            amount_sources[key] = source
+    line_items = extraction.get("line_items") or []
+    for correction in corrections.get("line_items") or []:
+        try:
+            index = int(correction.get("index"))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if not 0 <= index < len(line_items):
+            continue
+        item = line_items[index]
+        for key in LINE_ITEM_KEYS:
+            if f"line_items.{index}.{key}" in fields and correction.get(key) not in (None, ""):
+                item[key] = correction[key]
+                item["source"] = source
+    return extraction
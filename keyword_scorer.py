@@ -0,0 +1,162 @@
+import re
+
+import numpy as np
+
+# Domain keywords per category, as listed in the dc2.py classifier prompt
+DOMAIN_KEYWORDS = {
+    "Finance & Accounting": ["invoice", "audit", "budget", "cash flow", "profit margin", "revenue", "tax return",
+                             "debt-to-equity", "payroll", "balance sheet", "accounts payable", "financial statement"],
+    "Legal & Compliance": ["contract", "NDA", "compliance", "arbitration", "litigation", "regulatory",
+                           "intellectual property", "governance"],
+    "HR": ["employee", "performance review", "recruitment", "training", "career development",
+           "employee engagement", "retention", "salary", "job application", "termination"],
+    "Marketing & Sales": ["campaign", "digital marketing", "conversion", "SEO", "customer engagement", "ROI",
+                          "brand image", "market research", "pricing", "sponsorship"],
+    "Operations & Manufacturing": ["production", "quality control", "maintenance", "inventory", "scheduling",
+                                   "warehouse", "efficiency", "logistics", "quality assurance"],
+    "Procurement & Supply Chain": ["RFQ", "vendor", "procurement", "supplier", "contract", "negotiation",
+                                   "purchase order", "shipping invoice", "customs"],
+    "IT & Cybersecurity": ["cybersecurity", "software update", "network", "vulnerability", "intrusion", "malware",
+                           "firewall", "software license", "API", "cloud"],
+    "Executive Office / Strategy": ["strategic planning", "board meeting", "CEO", "organizational restructuring",
+                                    "investor", "business continuity"],
+    "Customer Service": ["support ticket", "refund", "complaint", "service agreement", "resolution",
+                         "troubleshooting"],
+    "Facility Management": ["maintenance", "repair", "safety", "lease", "emergency", "work order"],
+    "CSR": ["sustainability", "environmental", "eco-friendly", "ethical sourcing", "carbon footprint"],
+    "R&D": ["research", "prototype", "innovation", "feasibility", "development", "patent"],
+    "Spam / Fraud / Phishing": ["free", "click", "prize", "scam", "fraudulent", "phishing", "winner"],
+    "General / Miscellaneous": ["announcement", "newsletter", "policy", "travel", "event"],
+}
+
+LEAD_CHARS = 300  # keywords in the title/introduction count more
+LEAD_WEIGHT = 2.0
+ALTERNATIVE_RATIO = 0.9  # alternatives score within 10% of the best category
+MIN_KEYWORD_EVIDENCE = 5.0  # weighted score the best category needs before keywords alone decide
+KEYWORD_DECISION_SHARE = 0.85  # share of all keyword evidence the best category needs
+
+
+SEPARATOR = " "  # spaces and hyphens inside keywords match any run of whitespace or hyphens
+
+
+def _normalize_keyword(text):
+    return re.sub(r"[-\s]+", SEPARATOR, text.lower())
+
+
+def _trie_pattern(node):
+    """Turn a character trie into a regex in which keywords sharing a prefix share its branch"""
+    branches = []
+    for char, child in sorted(node.items(), key=lambda item: item[0] or ""):
+        if char is None:
+            continue
+        token = r"[-\s]+" if char == SEPARATOR else re.escape(char)
+        branches.append(token + _trie_pattern(child))
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if None in node:  # a keyword ends here, longer ones continue
+        pattern = "(?:" + pattern + ")?"
+    return pattern
+
+
+def build_keyword_matcher(keywords_by_category):
+    """
+    Compile all keywords into one regex, factored as a prefix trie so
+    the scan cost barely grows with the number of keywords, plus a keyword x category
+    weight matrix. A keyword listed under several categories splits its weight between them.
+    """
+    categories = list(keywords_by_category)
+    keywords = sorted({_normalize_keyword(kw) for kws in keywords_by_category.values() for kw in kws})
+    position = {keyword: i for i, keyword in enumerate(keywords)}
+    weights = np.zeros((len(keywords), len(categories)), dtype=np.float32)
+    for column, category in enumerate(categories):
+        for keyword in keywords_by_category[category]:
+            weights[position[_normalize_keyword(keyword)], column] = 1.0
+    weights /= weights.sum(axis=1, keepdims=True)
+
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[None] = True
+    # Simple plurals ("invoices", "tax returns") count as the keyword
+    pattern = re.compile(rf"\b(?:{_trie_pattern(trie)})(?:e?s)?\b")  # matched against lowercased text
+    lookup = {}
+    for keyword, i in position.items():
+        for variant in (keyword, keyword + "s", keyword + "es"):
+            lookup.setdefault(variant, i)
+    return {"pattern": pattern, "lookup": lookup, "keywords": keywords, "categories": categories, "weights": weights}
+
+
+DOMAIN_MATCHER = build_keyword_matcher(DOMAIN_KEYWORDS)
+
+
+def count_keywords(text, matcher=DOMAIN_MATCHER):
+    """Weighted occurrence count per keyword, from a single pass of the combined regex"""
+    counts = np.zeros(len(matcher["keywords"]), dtype=np.float32)
+    lookup = matcher["lookup"]
+    hits = []
+    for match in matcher["pattern"].finditer(text.lower()):
+        keyword = match.group()
+        index = lookup.get(keyword)
+        if index is None:  # irregular spacing or hyphenation
+            index = lookup[_normalize_keyword(keyword)]
+        hits.append((index, match.start()))
+    hits = np.array(hits)
+    if len(hits):
+        np.add.at(counts, hits[:, 0], np.where(hits[:, 1] < LEAD_CHARS, LEAD_WEIGHT, 1.0))
+    return counts
+
+
+def score_keywords(text, matcher=DOMAIN_MATCHER):
+    """
+    Return the keyword relevance score of every category, in matcher["categories"] order.
+    Repeats are damped logarithmically so boilerplate repeated throughout a document
+    does not outweigh a broad spread of domain terms.
+    """
+    return np.log1p(count_keywords(text, matcher)) @ matcher["weights"]
+
+
+def keyword_features(text, matcher=DOMAIN_MATCHER):
+    """Scores normalized so the best category is 1.0, with the primary category, alternatives and matched keywords"""
+    counts = count_keywords(text, matcher)
+    scores = np.log1p(counts) @ matcher["weights"]
+    best = float(scores.max())
+    normalized = scores / best if best > 0 else scores
+    ranking = np.argsort(-scores)
+    categories = matcher["categories"]
+    return {
+        "scores": {categories[i]: float(normalized[i]) for i in ranking if scores[i] > 0},
+        "evidence": best,
+        "share": best / float(scores.sum()) if best > 0 else 0.0,
+        "primary": categories[ranking[0]] if best > 0 else None,
+        "alternatives": [categories[i] for i in ranking[1:] if scores[i] > 0 and normalized[i] >= ALTERNATIVE_RATIO],
+        "matched": {matcher["keywords"][i]: int(round(counts[i])) for i in np.flatnonzero(counts)},
+    }
+
+
+def classify_by_keywords(features):
+    """Return a classification when the keywords alone leave no doubt, otherwise None"""
+    if features["evidence"] < MIN_KEYWORD_EVIDENCE or features["share"] < KEYWORD_DECISION_SHARE:
+        return None
+    return {
+        "category": features["primary"],
+        "confidence": round(features["share"], 2),
+        "key_phrases": sorted(features["matched"], key=features["matched"].get, reverse=True)[:10],
+        "alternative_categories": features["alternatives"],
+        "explanation": "Classified from domain keywords: nearly all keyword evidence points to this category.",
+        "source": "keywords",
+    }
+
+
+def format_keyword_features(features):
+    """Render the precomputed keyword scores as a block for the LLM prompt"""
+    if not features["scores"]:
+        return "Precomputed keyword relevance: no domain keywords found."
+    lines = ["Precomputed keyword relevance (normalized so the strongest category is 1.00):"]
+    lines.extend(f"- {category}: {score:.2f}" for category, score in features["scores"].items())
+    matched = ", ".join(f"{keyword} x{count}" for keyword, count in
+                        sorted(features["matched"].items(), key=lambda item: item[1], reverse=True))
+    lines.append(f"Matched keywords (title/introduction hits count double): {matched}")
+    return "\n".join(lines)
@@ -0,0 +1,96 @@
+import functools
+import logging
+import os
+import threading
+
+import streamlit as st
+from langchain_anthropic import ChatAnthropic
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.rate_limiters import InMemoryRateLimiter
+
+DEFAULT_MODEL = "claude-3-sonnet-20240229"
+
+PROMPT_CACHE_STATS = {
+    "requests": 0,
+    "cache_read_input_tokens": 0,
+    "cache_creation_input_tokens": 0,
+    "uncached_input_tokens": 0,
+}
+_stats_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+
+def get_api_key():
+    """
+    The Anthropic key from .streamlit/secrets.toml, else ANTHROPIC_API_KEY from the environment,
+    so the pages also work headless (batch CLI, service.py) without a secrets file
+    """
+    try:
+        key = st.secrets.get("ANTHROPIC_API_KEY")
+    except FileNotFoundError:  # no secrets.toml at all
+        key = None
+    return key or os.getenv("ANTHROPIC_API_KEY")
+
+
+@functools.lru_cache(maxsize=None)
+def _create_client(model, api_key, requests_per_second, max_bucket_size, params):
+    rate_limiter = None
+    if requests_per_second:
+        rate_limiter = InMemoryRateLimiter(
+            requests_per_second=requests_per_second,
+            max_bucket_size=max_bucket_size or 1
+        )
+    return ChatAnthropic(
+        model=model,
+        anthropic_api_key=api_key,
+        rate_limiter=rate_limiter,
+        **dict(params)
+    )
+
+
+def get_llm(model=DEFAULT_MODEL, api_key=None, requests_per_second=None, max_bucket_size=None, **params):
+    """
+    Return the process-wide ChatAnthropic client for a model and parameter set.
+    Clients are created once and reused, so their HTTP connection pool (and the
+    keep-alive connections in it) survives Streamlit reruns and concurrent callers.
+    """
+    return _create_client(model, api_key, requests_per_second, max_bucket_size, tuple(sorted(params.items())))
+
+
+def cached_prompt_messages(static_prompt, document_prompt):
+    """
+    Build the messages for a call whose instructions never change between documents.
+    The static part is sent as a system block marked for Anthropic prompt caching,
+    so repeat calls only pay full price for the per-document message.
+    """
+    return [
+        SystemMessage(content=[{"type": "text", "text": static_prompt, "cache_control": {"type": "ephemeral"}}]),
+        HumanMessage(content=document_prompt),
+    ]
+
+
+def record_prompt_cache_usage(response):
+    """Add the cached and uncached input tokens of a response to PROMPT_CACHE_STATS"""
+    usage = (getattr(response, "response_metadata", None) or {}).get("usage") or {}
+    call_usage = {
+        "cache_read_input_tokens": usage.get("cache_read_input_tokens") or 0,
+        "cache_creation_input_tokens": usage.get("cache_creation_input_tokens") or 0,
+        "uncached_input_tokens": usage.get("input_tokens") or 0,
+    }
+    with _stats_lock:
+        PROMPT_CACHE_STATS["requests"] += 1
+        for key, value in call_usage.items():
+            PROMPT_CACHE_STATS[key] += value
+    logger.info(
+        "Prompt cache: %d cached, %d written, %d uncached input tokens",
+        call_usage["cache_read_input_tokens"],
+        call_usage["cache_creation_input_tokens"],
+        call_usage["uncached_input_tokens"],
+    )
+    return call_usage
+
+
+def get_prompt_cache_stats():
+    """Return the prompt cache token counters for this process"""
+    with _stats_lock:
+        return dict(PROMPT_CACHE_STATS)
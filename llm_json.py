@@ -0,0 +1,372 @@
+import json
+import re
+
+# Tolerant parsing of the JSON in LLM responses. Handles code fences, prose around the value,
+# single quotes, Python literals, trailing commas, unescaped quotes or newlines in strings, and
+# output cut off mid-value. Also validates against small per-endpoint schemas.
+MAX_REPAIR_CHARS = 20000  # the repair call sends only the broken response, never the document
+MAX_START_ATTEMPTS = 20  # brackets in prose before the JSON that are tried as its start
+
+REPAIR_PROMPT = """The text below was meant to be a single JSON value{shape} but it cannot be used: {errors}
+
+Return ONLY the corrected JSON, keeping its content, with no other text.
+
+{raw}"""
+
+_FENCE = re.compile(r"```[A-Za-z]*[ \t]*\n?(.*?)(?:```|$)", re.DOTALL)
+_NUMBER = re.compile(r"-?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?")
+_BARE_WORD = re.compile(r"[A-Za-z_$][\w$-]*")
+_NEXT_ITEM = re.compile(r"(?:[A-Za-z_$][\w$-]*\s*:|(?:true|false|null|True|False|None)\b)")
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+_MISSING = object()
+_DECODER = json.JSONDecoder()
+
+
+class LLMJSONError(ValueError):
+    """
+    A response holds no usable JSON, or its JSON does not match the expected schema.
+    needs_document is set when a value is wrong rather than malformed (e.g. an unknown category),
+    which only a call that sees the document again can fix.
+    """
+
+    def __init__(self, message, raw=None, errors=(), needs_document=False):
+        super().__init__(message)
+        self.raw = raw
+        self.errors = list(errors)
+        self.needs_document = needs_document
+
+
+class _ValueError(str):
+    """A validation error about a value's content, not its format"""
+
+
+class _Parser:
+    """Recursive-descent parser that repairs as it goes and stops cleanly at the end of the input"""
+
+    def __init__(self, text, start):
+        self.text = text
+        self.pos = start
+        self.truncated = False
+
+    def skip(self):
+        text = self.text
+        while self.pos < len(text):
+            if text[self.pos].isspace():
+                self.pos += 1
+            elif text.startswith("//", self.pos):
+                end = text.find("\n", self.pos)
+                self.pos = len(text) if end == -1 else end
+            elif text.startswith("/*", self.pos):
+                end = text.find("*/", self.pos + 2)
+                self.pos = len(text) if end == -1 else end + 2
+            else:
+                break
+
+    def value(self):
+        self.skip()
+        if self.pos >= len(self.text):
+            self.truncated = True
+            return _MISSING
+        char = self.text[self.pos]
+        if char == "{":
+            return self.container("}", {})
+        if char == "[":
+            return self.container("]", [])
+        if char in "\"'":
+            return self.string()
+        number = _NUMBER.match(self.text, self.pos)
+        if number:
+            self.pos = number.end()
+            token = number.group()
+            return float(token) if any(c in token for c in ".eE") else int(token)
+        word = _BARE_WORD.match(self.text, self.pos)
+        if word and word.group() in _LITERALS:
+            self.pos = word.end()
+            return _LITERALS[word.group()]
+        if word and word.end() == len(self.text):  # a literal cut off mid-word
+            self.pos = word.end()
+            self.truncated = True
+            return _MISSING
+        # Other bare words are prose, e.g. "[see below]" before the actual JSON
+        raise LLMJSONError(f"Unexpected {char!r} at position {self.pos}")
+
+    def container(self, closing, result):
+        self.pos += 1
+        while True:
+            self.skip()
+            if self.pos >= len(self.text):
+                self.truncated = True
+                return result
+            char = self.text[self.pos]
+            if char in "}]":  # a mismatched bracket closes the container too
+                self.pos += 1
+                return result
+            if char == ",":  # trailing and doubled commas
+                self.pos += 1
+                continue
+            if isinstance(result, list):
+                item = self.value()
+                if item is not _MISSING:
+                    result.append(item)
+            else:
+                key = self.key()
+                if key is _MISSING or self.truncated:
+                    return result
+                self.skip()
+                if self.pos < len(self.text) and self.text[self.pos] in ":=":
+                    self.pos += 1
+                item = self.value()
+                if item is not _MISSING:
+                    result[key] = item
+            if self.truncated:
+                return result
+
+    def key(self):
+        char = self.text[self.pos]
+        if char in "\"'":
+            return self.string()
+        word = _BARE_WORD.match(self.text, self.pos) or _NUMBER.match(self.text, self.pos)
+        if not word:
+            raise LLMJSONError(f"Unexpected {char!r} at position {self.pos}")
+        self.pos = word.end()
+        return word.group()
+
+    def _closes_string(self, position):
+        """
+        A quote ends the string only if what follows could follow a string value or key; otherwise
+        it is an unescaped quote inside the text ("body": "Dear Mr. "Smith", thank you").
+        """
+        rest = self.text[position + 1:position + 200].lstrip()
+        if not rest or rest[0] in ":}]\"" or rest.startswith("//"):
+            return True
+        if rest[0] != ",":
+            return False
+        after = rest[1:].lstrip()
+        return not after or after[0] in "\"'{[}]-" or after[0].isdigit() or bool(_NEXT_ITEM.match(after))
+
+    def string(self):
+        quote = self.text[self.pos]
+        self.pos += 1
+        parts = []
+        text = self.text
+        while self.pos < len(text):
+            char = text[self.pos]
+            if char == quote and self._closes_string(self.pos):
+                self.pos += 1
+                return _join(parts)
+            if char == "\\":
+                if self.pos + 1 >= len(text):
+                    break
+                escape = text[self.pos + 1]
+                if escape == "u":
+                    digits = text[self.pos + 2:self.pos + 6]
+                    if len(digits) < 4:
+                        break
+                    try:
+                        parts.append(chr(int(digits, 16)))
+                    except ValueError:
+                        parts.append(digits)
+                    self.pos += 6
+                    continue
+                parts.append(_ESCAPES.get(escape, escape))
+                self.pos += 2
+                continue
+            parts.append(char)
+            self.pos += 1
+        self.pos = len(text)
+        self.truncated = True
+        return _join(parts)
+
+
+def _join(parts):
+    text = "".join(parts)
+    if re.search("[\ud800-\udfff]", text):  # \u-escaped surrogate pairs
+        text = text.encode("utf-16", "surrogatepass").decode("utf-16", "replace")
+    return text
+
+
+def _json_starts(text, expect):
+    openers = {"object": "{", "array": "["}.get(expect, "{[")
+    return [match.start() for match in re.finditer("[" + re.escape(openers) + "]", text)]
+
+
+def _candidates(text):
+    """The contents of code fences first (models often wrap JSON in them), then the whole text"""
+    fenced = [match.group(1) for match in _FENCE.finditer(text) if re.search(r"[{\[]", match.group(1))]
+    return fenced + [text]
+
+
+def parse_partial(text, expect=None):
+    """
+    Parse as much of the JSON value in text as is there so far.
+    Returns (value, complete); value is None when no JSON has started yet, and complete is
+    False when the value was cut off. expect ("object" or "array") skips to the first
+    value of that type, past brackets in any surrounding prose.
+    """
+    for candidate in _candidates(text or ""):
+        for start in _json_starts(candidate, expect)[:MAX_START_ATTEMPTS]:
+            try:  # well-formed JSON takes the C decoder
+                return _DECODER.raw_decode(candidate, start)[0], True
+            except ValueError:
+                pass
+            parser = _Parser(candidate, start)
+            try:
+                value = parser.value()
+            except LLMJSONError:
+                continue
+            if value is not _MISSING:
+                return value, not parser.truncated
+    return None, False
+
+
+def _type_name(value):
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    return {dict: "object", list: "array", str: "string", type(None): "null"}.get(type(value), type(value).__name__)
+
+
+def _coerce(value, expected):
+    """Convert the mismatches models commonly produce ("0.92" or "92%" for a number, 5 for a string)"""
+    if expected == "number" and isinstance(value, str):
+        match = re.fullmatch(r"\s*(-?\d+(?:[.,]\d+)?)\s*(%?)\s*", value)
+        if match:
+            number = float(match.group(1).replace(",", "."))
+            return number / 100 if match.group(2) else number
+    if expected == "string" and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if expected == "array" and isinstance(value, (str, dict)):
+        return [value]
+    return value
+
+
+def validate(value, schema, path="$"):
+    """
+    Check value against a small JSON-schema subset (type, required, properties, items, enum,
+    minimum, maximum), coercing near-misses. Returns (value, errors).
+    """
+    errors = []
+    expected = schema.get("type")
+    if expected:
+        value = _coerce(value, expected)
+        if _type_name(value) != expected:
+            return value, [f"{path} should be {expected}, got {_type_name(value)}"]
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(_ValueError(f"{path} is {value!r}, not one of {', '.join(map(str, schema['enum']))}"))
+    if "minimum" in schema and value < schema["minimum"]:
+        errors.append(f"{path} is {value}, below the minimum {schema['minimum']}")
+    if "maximum" in schema and value > schema["maximum"]:
+        errors.append(f"{path} is {value}, above the maximum {schema['maximum']}")
+    if isinstance(value, dict):
+        value = dict(value)
+        errors.extend(f"{path}.{key} is missing" for key in schema.get("required", ()) if key not in value)
+        for key, property_schema in schema.get("properties", {}).items():
+            if key in value:
+                value[key], property_errors = validate(value[key], property_schema, f"{path}.{key}")
+                errors.extend(property_errors)
+    if isinstance(value, list) and "items" in schema:
+        validated = []
+        for i, item in enumerate(value):
+            item, item_errors = validate(item, schema["items"], f"{path}[{i}]")
+            validated.append(item)
+            errors.extend(item_errors)
+        value = validated
+    return value, errors
+
+
+def parse_json(text, schema=None):
+    """Extract, repair and validate the JSON value in an LLM response; raises LLMJSONError"""
+    value, _ = parse_partial(text, (schema or {}).get("type"))
+    if value is None:
+        raise LLMJSONError("No JSON found in the response", raw=text, errors=["no JSON value found"])
+    if schema:
+        value, errors = validate(value, schema)
+        if errors:
+            message = "Response JSON does not match the expected format: " + "; ".join(errors)
+            needs_document = any(isinstance(error, _ValueError) for error in errors)
+            raise LLMJSONError(message, raw=text, errors=errors, needs_document=needs_document)
+    return value
+
+
+def _shape(schema):
+    if not schema:
+        return ""
+    required = schema.get("required")
+    shape = f" ({schema.get('type', 'value')}"
+    return shape + (f" with the keys {', '.join(required)})" if required else ")")
+
+
+def parse_llm_json(llm, text, schema=None):
+    """
+    Parse an LLM response like parse_json; if that fails, ask the model once to fix its own output.
+    The repair call sends only the broken response and the errors, which costs far less than
+    classifying or extracting the document again. Errors the model cannot fix without the
+    document (needs_document, e.g. a category outside the enum) are raised instead of repaired.
+    """
+    try:
+        return parse_json(text, schema)
+    except LLMJSONError as e:
+        if e.needs_document:
+            raise
+        prompt = REPAIR_PROMPT.format(
+            shape=_shape(schema), errors="; ".join(e.errors), raw=(text or "")[:MAX_REPAIR_CHARS]
+        )
+        return parse_json(chunk_text(llm.invoke(prompt)), schema)
+
+
+def chunk_text(message):
+    """The text of a LangChain message or stream chunk, whose content may be a list of blocks"""
+    content = getattr(message, "content", message)
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content or [])
+
+
+def stream_json(chunks, expect=None):
+    """
+    Parse a growing stream of chunks incrementally, yielding (value, complete, text) after every chunk;
+    value is None until the JSON starts. Each step re-parses the text so far, which is cheap at the
+    size of model responses.
+    """
+    text = ""
+    for chunk in chunks:
+        text += chunk_text(chunk)
+        value, complete = parse_partial(text, expect)
+        yield value, complete, text
+
+
+def invoke_json(llm, prompt, schema=None, on_partial=None):
+    """
+    Call the model and return (parsed value, response text).
+    With on_partial the response is streamed, and on_partial(value) is called with every
+    partially parsed value, so pages can render results before the model finishes.
+    """
+    if on_partial is None:
+        text = chunk_text(llm.invoke(prompt))
+    else:
+        text = ""
+        last = None
+        for value, _, text in stream_json(llm.stream(prompt), (schema or {}).get("type")):
+            if value is not None and value != last:
+                on_partial(value)
+                last = value
+    return parse_llm_json(llm, text, schema), text
+
+
+def classification_schema(categories=None):
+    """Schema of the classifier responses: a category (one of categories, if given) and a 0-1 confidence"""
+    category = {"type": "string"}
+    if categories:
+        category["enum"] = list(categories)
+    return {
+        "type": "object",
+        "required": ["category", "confidence"],
+        "properties": {
+            "category": category,
+            "confidence": {"type": "number", "minimum": 0, "maximum": 1},
+            "key_phrases": {"type": "array", "items": {"type": "string"}},
+            "alternative_categories": {"type": "array"},
+        },
+    }
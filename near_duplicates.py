@@ -0,0 +1,159 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# MinHash signatures of classified documents with an LSH band index, persisted in SQLite
+NEAR_DUPLICATE_DB = "near_duplicates.db"
+NEAR_DUPLICATE_MAX_ENTRIES = 50000
+DUPLICATE_THRESHOLD = 0.8  # estimated Jaccard similarity of shingle sets
+SHINGLE_SIZE = 5  # characters, after removing whitespace so OCR spacing differences do not matter
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16  # 16 bands x 8 rows: pairs above ~0.7 Jaccard almost always share a bucket
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def _permutation_parameters(name, low):
+    # Derived from SHA-256 rather than a random generator, so signatures stay comparable across restarts and versions
+    values = [int.from_bytes(hashlib.sha256(f"{name}{i}".encode()).digest()[:8], "big") for i in range(NUM_PERMUTATIONS)]
+    return np.array([low + value % (_MERSENNE_PRIME - low) for value in values], dtype=np.uint64).reshape(-1, 1)
+
+
+_PERM_A = _permutation_parameters("a", 1)
+_PERM_B = _permutation_parameters("b", 0)
+
+NEAR_DUPLICATE_STATS = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _connect():
+    conn = sqlite3.connect(NEAR_DUPLICATE_DB, timeout=30)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,
+            namespace TEXT NOT NULL,
+            signature BLOB NOT NULL,
+            classification TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )"""
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS lsh_buckets (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            document_id INTEGER NOT NULL
+        )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lsh_buckets ON lsh_buckets (band, bucket)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lsh_buckets_document ON lsh_buckets (document_id)")
+    return conn
+
+
+def _shingle_hashes(text):
+    """Hash every SHINGLE_SIZE-character window of the normalized text, vectorized with a polynomial hash"""
+    normalized = re.sub(r"[\W_]+", "", text.lower())
+    data = np.frombuffer(normalized.encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    if len(data) < SHINGLE_SIZE:
+        return np.empty(0, dtype=np.uint64)
+    hashes = np.zeros(len(data) - SHINGLE_SIZE + 1, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        hashes = (hashes * np.uint64(257) + data[offset:len(hashes) + offset]) % np.uint64(_MERSENNE_PRIME)
+    return np.unique(hashes)
+
+
+def minhash_signature(text):
+    """Return the MinHash signature of a text, or None if it is too short to shingle"""
+    hashes = _shingle_hashes(text)
+    if not len(hashes):
+        return None
+    permuted = (_PERM_A * hashes[None, :] + _PERM_B) % np.uint64(_MERSENNE_PRIME)
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def _band_buckets(signature, namespace):
+    buckets = []
+    for band in range(LSH_BANDS):
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(namespace.encode("utf-8"))
+        digest.update(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes())
+        buckets.append((band, int.from_bytes(digest.digest(), "big", signed=True)))
+    return buckets
+
+
+def estimated_similarity(signature, other):
+    """Estimate the Jaccard similarity of two shingle sets from their signatures"""
+    return float(np.mean(signature == other))
+
+
+def find_near_duplicate(text, namespace, threshold=DUPLICATE_THRESHOLD):
+    """
+    Return {"classification", "similarity", "id"} for the most similar earlier document in
+    the namespace whose estimated Jaccard similarity reaches threshold, otherwise None.
+    On ties the most recent document wins, so a re-filed correction overrides the original.
+    """
+    signature = minhash_signature(text)
+    if signature is None:
+        return None
+    best = None
+    try:
+        with _connect() as conn:
+            candidates = set()
+            for band, bucket in _band_buckets(signature, namespace):
+                candidates.update(row[0] for row in conn.execute(
+                    "SELECT document_id FROM lsh_buckets WHERE band = ? AND bucket = ?", (band, bucket)
+                ))
+            for document_id in candidates:
+                row = conn.execute(
+                    "SELECT signature, classification FROM documents WHERE id = ? AND namespace = ?",
+                    (document_id, namespace),
+                ).fetchone()
+                if row is None:
+                    continue
+                similarity = estimated_similarity(signature, np.frombuffer(row[0], dtype=np.uint32))
+                if similarity < threshold:
+                    continue
+                if best is None or (similarity, document_id) > (best["similarity"], best["id"]):
+                    best = {"classification": json.loads(row[1]), "similarity": similarity, "id": document_id}
+    except (sqlite3.Error, ValueError):
+        best = None
+    with _stats_lock:
+        NEAR_DUPLICATE_STATS["hits" if best else "misses"] += 1
+    return best
+
+
+def remember_document(text, namespace, classification):
+    """Index a classified document so later near-duplicates can reuse its classification"""
+    signature = minhash_signature(text)
+    if signature is None or not isinstance(classification, dict):
+        return None
+    try:
+        with _connect() as conn:
+            document_id = conn.execute(
+                "INSERT INTO documents (namespace, signature, classification, created_at) VALUES (?, ?, ?, ?)",
+                (namespace, signature.tobytes(), json.dumps(classification), time.time()),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO lsh_buckets (band, bucket, document_id) VALUES (?, ?, ?)",
+                [(band, bucket, document_id) for band, bucket in _band_buckets(signature, namespace)],
+            )
+            cutoff = conn.execute(
+                "SELECT id FROM documents ORDER BY id DESC LIMIT 1 OFFSET ?", (NEAR_DUPLICATE_MAX_ENTRIES,)
+            ).fetchone()
+            if cutoff:
+                conn.execute("DELETE FROM lsh_buckets WHERE document_id <= ?", cutoff)
+                conn.execute("DELETE FROM documents WHERE id <= ?", cutoff)
+        return document_id
+    except (sqlite3.Error, TypeError, ValueError):
+        return None
+
+
+def get_near_duplicate_stats():
+    """Return near-duplicate hit/miss counters for this process"""
+    with _stats_lock:
+        return dict(NEAR_DUPLICATE_STATS)
@@ -0,0 +1,81 @@
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+
+PARALLEL_MIN_PAGES = 32  # below this, process start-up costs more than it saves
+PAGES_PER_TASK = 16
+
+_worker_reader = None
+
+
+def iter_page_text(file):
+    """Yield the text of each non-empty PDF page, extracting pages lazily"""
+    pdf_reader = PyPDF2.PdfReader(file)
+    for page in pdf_reader.pages:
+        page_text = page.extract_text()
+        if page_text:
+            yield page_text
+
+
+def extract_text_with_budget(file, max_chars, separator="\n"):
+    """Join page texts up to max_chars characters, stopping as soon as the budget is reached"""
+    parts = []
+    length = 0
+    for page_text in iter_page_text(file):
+        if parts:
+            length += len(separator)
+        parts.append(page_text)
+        length += len(page_text)
+        if length >= max_chars:
+            break
+    return separator.join(parts)[:max_chars]
+
+
+def _open_worker_pdf(data):
+    global _worker_reader
+    _worker_reader = PyPDF2.PdfReader(io.BytesIO(data))
+
+
+def _extract_page_range(start, end):
+    return [_worker_reader.pages[i].extract_text() for i in range(start, end)]
+
+
+def _read_bytes(file):
+    if isinstance(file, bytes):
+        return file
+    if isinstance(file, str):
+        with open(file, "rb") as f:
+            return f.read()
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    file.seek(0)
+    return file.read()
+
+
+def extract_pages(file, start=0, end=None, max_workers=None):
+    """
+    Extract the text of pages [start, end) in page order.
+    Long documents are split into page ranges that are extracted in a process pool,
+    with each worker opening the PDF on its own.
+    """
+    data = _read_bytes(file)
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+    total_pages = len(pdf_reader.pages)
+    end = total_pages if end is None else min(end, total_pages)
+    start = max(start, 0)
+
+    if end - start < PARALLEL_MIN_PAGES:
+        return [pdf_reader.pages[i].extract_text() for i in range(start, end)]
+
+    starts = list(range(start, end, PAGES_PER_TASK))
+    ends = [min(s + PAGES_PER_TASK, end) for s in starts]
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_open_worker_pdf,
+        initargs=(data,),
+    ) as pool:
+        page_ranges = pool.map(_extract_page_range, starts, ends)
+        return [page_text for page_range in page_ranges for page_text in page_range]
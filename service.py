@@ -0,0 +1,251 @@
+"""
+HTTP API for the document pages: POST /classify, /extract, /summarize and /translate.
+
+Send a PDF as the request body (Content-Type: application/pdf, options in the query string)
+or JSON with a "text" field plus the options. Run from the repository root, where
+.streamlit/secrets.toml provides ANTHROPIC_API_KEY just as it does for the pages:
+
+    python service.py --port 8080
+
+Set ANTHROPIC_API_URL to point every Claude call at another server, e.g. fake_llm_server.py
+(tests/test_service.py runs the service against it end to end).
+
+Requests are handled asynchronously, but the Claude calls are not: each job runs the pages' own
+synchronous functions (with their caches, stores and fast paths) on a thread pool, so at most
+MAX_CONCURRENT_JOBS documents are in progress, each holding a thread while it waits on Claude.
+Waiting requests, coalesced or queued, hold no thread.
+"""
+import argparse
+import asyncio
+import hashlib
+import importlib
+import io
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from llm_clients import get_prompt_cache_stats
+from shared_resources import get_load_metrics, get_resource, warm_up
+
+MAX_CONCURRENT_JOBS = 16  # documents processed at once; further requests wait without holding a thread
+SUMMARY_STYLES = ("executive", "detailed", "bullet")
+DEFAULT_MAX_WORDS = 250
+DEFAULT_FOCUS = "key findings"
+MAX_BODY_BYTES = 50 * 1024 * 1024
+
+SERVICE_STATS = {"requests": 0, "coalesced": 0, "jobs": 0, "failed": 0, "in_flight": 0}
+_stats_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+
+class InvalidDocument(ValueError):
+    """The request carries no usable document text"""
+
+
+def _page(module_name):
+    """Import a page module once; the pages create their Claude clients at import time"""
+    return get_resource(f"page:{module_name}", lambda: importlib.import_module(module_name))
+
+
+def _count(**increments):
+    with _stats_lock:
+        for key, value in increments.items():
+            SERVICE_STATS[key] += value
+
+
+def _document_text(document, is_text, extract):
+    text = document if is_text else extract(io.BytesIO(document))
+    if not text or not text.strip():
+        raise InvalidDocument("No text could be extracted from the document")
+    return text
+
+
+def classify(document, is_text):
+    classifier = _page("classifier")
+    result = classifier.classify_document(_document_text(document, is_text, classifier.process_pdf))
+    if result is None:
+        raise RuntimeError("Classification failed")
+    return result
+
+
+def extract(document, is_text):
+    extractor = _page("02_Data_Extractor")
+    result = extractor.extract_document_info(_document_text(document, is_text, extractor.process_pdf))
+    if result is None:
+        raise RuntimeError("Extraction failed")
+    return result
+
+
+def summarize(document, is_text, style, max_words, focus):
+    summarizer = _page("03_Document_Summarization")
+    text = _document_text(document, is_text, summarizer.extract_text)
+    return {"summary": summarizer.get_summary(text, style, max_words, focus)}
+
+
+def translate(document, is_text, source_lang):
+    translator = _page("05_Translator")
+    text = _document_text(document, is_text, translator.extract_text)
+    source_lang = source_lang or translator.detect_language(text)
+    return {"source_lang": source_lang, "translation": translator.translate_text(text, source_lang)}
+
+
+class DocumentService:
+    """
+    Runs the page functions behind a bounded semaphore on a dedicated thread pool, and
+    coalesces in-flight work: concurrent requests for the same endpoint, document hash
+    and options await one shared job, so a burst of retries or duplicate submissions
+    makes a single set of Claude calls.
+    Jobs are the synchronous page functions, not ainvoke calls, so concurrency is bounded by
+    the thread pool rather than by the event loop.
+    """
+
+    def __init__(self, max_concurrent_jobs=MAX_CONCURRENT_JOBS):
+        self.semaphore = asyncio.Semaphore(max_concurrent_jobs)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="document-job")
+        self.in_flight = {}
+
+    async def run(self, key, func, *args):
+        _count(requests=1)
+        job = self.in_flight.get(key)
+        if job is None:
+            job = asyncio.ensure_future(self._run_job(func, *args))
+            self.in_flight[key] = job
+            job.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            _count(coalesced=1)
+        # A client that disconnects cancels its own wait, not the job other requests share
+        return await asyncio.shield(job)
+
+    async def _run_job(self, func, *args):
+        async with self.semaphore:
+            _count(jobs=1, in_flight=1)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+            except Exception:
+                _count(failed=1)
+                raise
+            finally:
+                _count(in_flight=-1)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _read_document(request):
+    """Return (document, is_text, options) from a JSON or raw PDF request body"""
+    if request.content_type == "application/json":
+        try:
+            payload = await request.json()
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(text="Request body is not valid JSON")
+        if not isinstance(payload, dict) or not isinstance(payload.get("text"), str):
+            raise web.HTTPBadRequest(text='JSON requests need a "text" string')
+        return payload.pop("text"), True, payload
+    document = await request.read()
+    if not document:
+        raise web.HTTPBadRequest(text="Send a PDF as the request body or JSON with a text field")
+    return document, False, dict(request.query)
+
+
+def _document_key(endpoint, document, is_text, options):
+    digest = hashlib.sha256(document.encode("utf-8") if is_text else document).hexdigest()
+    return endpoint, digest, is_text, json.dumps(options, sort_keys=True)
+
+
+async def _respond(request, endpoint, func, document, is_text, options):
+    key = _document_key(endpoint, document, is_text, options)
+    try:
+        result = await request.app["service"].run(key, func, document, is_text, *options.values())
+    except InvalidDocument as e:
+        raise web.HTTPUnprocessableEntity(text=str(e))
+    except Exception as e:
+        logger.exception("%s request failed", endpoint)
+        raise web.HTTPBadGateway(text=f"{endpoint} failed: {e}")
+    return web.json_response(result)
+
+
+async def handle_classify(request):
+    document, is_text, _ = await _read_document(request)
+    return await _respond(request, "classify", classify, document, is_text, {})
+
+
+async def handle_extract(request):
+    document, is_text, _ = await _read_document(request)
+    return await _respond(request, "extract", extract, document, is_text, {})
+
+
+async def handle_summarize(request):
+    document, is_text, options = await _read_document(request)
+    style = options.get("style", "executive")
+    if style not in SUMMARY_STYLES:
+        raise web.HTTPBadRequest(text=f"style must be one of {', '.join(SUMMARY_STYLES)}")
+    try:
+        max_words = int(options.get("max_words", DEFAULT_MAX_WORDS))
+    except (TypeError, ValueError):
+        raise web.HTTPBadRequest(text="max_words must be an integer")
+    options = {"style": style, "max_words": max_words, "focus": str(options.get("focus", DEFAULT_FOCUS))}
+    return await _respond(request, "summarize", summarize, document, is_text, options)
+
+
+async def handle_translate(request):
+    document, is_text, options = await _read_document(request)
+    options = {"source_lang": options.get("source_lang") or None}
+    return await _respond(request, "translate", translate, document, is_text, options)
+
+
+async def handle_stats(request):
+    with _stats_lock:
+        stats = dict(SERVICE_STATS)
+    return web.json_response({
+        "service": stats,
+        "prompt_cache": get_prompt_cache_stats(),
+        "load_seconds": get_load_metrics(),
+    })
+
+
+async def handle_health(request):
+    return web.json_response({"status": "ok"})
+
+
+def create_app(max_concurrent_jobs=MAX_CONCURRENT_JOBS):
+    """Build the aiohttp application; call inside a running event loop or hand to web.run_app"""
+    app = web.Application(client_max_size=MAX_BODY_BYTES)
+    app.add_routes([
+        web.post("/classify", handle_classify),
+        web.post("/extract", handle_extract),
+        web.post("/summarize", handle_summarize),
+        web.post("/translate", handle_translate),
+        web.get("/stats", handle_stats),
+        web.get("/health", handle_health),
+    ])
+
+    async def start(app):
+        app["service"] = DocumentService(max_concurrent_jobs)
+
+    async def stop(app):
+        app["service"].close()
+
+    app.on_startup.append(start)
+    app.on_cleanup.append(stop)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve classification, extraction, summarization and translation over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-concurrent-jobs", type=int, default=MAX_CONCURRENT_JOBS,
+                        help="documents processed at once")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    # Import the pages before the first request instead of during it
+    warm_up(*(lambda name=name: _page(name) for name in
+              ("classifier", "02_Data_Extractor", "03_Document_Summarization", "05_Translator")))
+    web.run_app(create_app(args.max_concurrent_jobs), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
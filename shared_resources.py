@@ -0,0 +1,92 @@
+import logging
+import threading
+import time
+
+from correction_store import import_legacy_corrections, load_correction_index
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Seconds each resource took to load in this process
+LOAD_METRICS = {}
+_resources = {}
+_resource_locks = {}
+_registry_lock = threading.Lock()
+_started_warm_ups = set()
+logger = logging.getLogger(__name__)
+
+
+def get_resource(name, loader):
+    """
+    Return the process-wide resource called name, calling loader on first use only.
+    Streamlit reruns the page script on every interaction, but this module is imported
+    once, so models and indexes loaded here survive reruns and are shared by all sessions.
+    """
+    if name in _resources:
+        return _resources[name]
+    with _registry_lock:
+        lock = _resource_locks.setdefault(name, threading.Lock())
+    with lock:
+        if name not in _resources:
+            start = time.perf_counter()
+            resource = loader()
+            seconds = time.perf_counter() - start
+            with _registry_lock:
+                _resources[name] = resource
+                LOAD_METRICS[name] = seconds
+            logger.info("Loaded %s in %.2fs", name, seconds)
+    return _resources[name]
+
+
+def get_embedding_model():
+    """Return the shared SentenceTransformer used for correction and example embeddings"""
+    def load():
+        from sentence_transformers import SentenceTransformer  # imports torch, so only when first needed
+        return SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return get_resource("embedding_model", load)
+
+
+def prepare_corrections(corrections_file):
+    """Import the legacy corrections file once and load the correction index"""
+    def load():
+        from embedding_cache import embed_texts  # embedding_cache builds on this module
+        import_legacy_corrections(corrections_file, embed_texts)
+        return load_correction_index()
+    get_resource("correction_index", load)
+
+
+def warm_up(*loaders, background=True):
+    """
+    Load resources before the first request needs them.
+    By default this runs in a background thread, so the page renders while models load;
+    a request that needs a resource still loading waits for that load instead of starting another.
+    """
+    def run():
+        for loader in loaders:
+            try:
+                loader()
+            except Exception:
+                logger.exception("Warm-up failed; the resource will be loaded on first use")
+
+    if background:
+        threading.Thread(target=run, name="resource-warm-up", daemon=True).start()
+    else:
+        run()
+
+
+def warm_up_once(name, *loaders, background=True):
+    """
+    Like warm_up, but only the first call for a name in this process starts the loaders.
+    Streamlit runs a page's main() on every rerun; without this each click would start
+    another warm-up thread, and a loader that keeps failing would be retried every time.
+    """
+    with _registry_lock:
+        if name in _started_warm_ups:
+            return
+        _started_warm_ups.add(name)
+    warm_up(*loaders, background=background)
+
+
+def get_load_metrics():
+    """Return how long each loaded resource took to load"""
+    with _registry_lock:
+        return dict(LOAD_METRICS)
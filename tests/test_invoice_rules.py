@@ -0,0 +1,73 @@
+import pytest
+
+from invoice_rules import extract_invoice_fields, merge_extractions, rules_are_complete
+
+INVOICE = """Rechnungsnummer: RE-2024-001
+Rechnungsdatum: 05.01.2024
+USt-IdNr.: DE136695976
+Nettobetrag: 1.000,00 EUR
+MwSt 19 %: 190,00 EUR
+Gesamtbetrag: 1.190,00 EUR
+"""
+
+
+def _values(rules):
+    return {field["field_name"]: (field["value"], field["confidence"]) for field in rules["extracted_fields"]}
+
+
+@pytest.mark.parametrize("terms", ["Zahlungsbedingungen: Netto 30 Tage", "Payment terms: Net 30 days"])
+@pytest.mark.parametrize("terms_first", [True, False])
+def test_payment_terms_are_not_a_net_amount(terms, terms_first):
+    text = terms + "\n" + INVOICE if terms_first else INVOICE + terms + "\n"
+    rules = extract_invoice_fields(text)
+
+    assert rules["amounts"]["net_amount"] == "1000.00"
+    assert rules["amount_confidence"]["net_amount"] == "high"
+    assert rules_are_complete(rules)
+
+
+def test_specific_amount_label_overrides_generic_one():
+    rules = extract_invoice_fields("Netto: 30\nNettobetrag: 1.000,00 EUR\n")
+
+    assert rules["amounts"]["net_amount"] == "1000.00"
+    assert rules["amount_confidence"]["net_amount"] == "high"
+
+
+def test_llm_amount_beats_generic_rule_amount():
+    rules = extract_invoice_fields("Netto: 30\nMwSt: 190,00\n")
+    assert rules["amount_confidence"] == {"net_amount": "medium", "tax_amount": "high"}
+
+    merged = merge_extractions(rules, {"amounts": {"net_amount": "1.000,00", "tax_amount": "19,00"}})
+
+    assert merged["amounts"]["net_amount"] == "1.000,00"
+    assert merged["amount_sources"]["net_amount"] == "llm"
+    assert merged["amounts"]["tax_amount"] == "190.00"  # validated rule values still win
+    assert merged["amount_sources"]["tax_amount"] == "rules"
+
+
+def test_generic_rule_amount_kept_when_llm_has_none():
+    merged = merge_extractions(extract_invoice_fields("Netto: 100,00\n"), {"amounts": {"net_amount": ""}})
+
+    assert merged["amounts"]["net_amount"] == "100.00"
+    assert merged["amount_sources"]["net_amount"] == "rules"
+
+
+@pytest.mark.parametrize("qualified", ["Due Date: 15.02.2024", "Order Date: 01.01.2024", "Fälligkeit Datum: 15.02.2024"])
+def test_qualified_dates_are_not_the_invoice_date(qualified):
+    rules = extract_invoice_fields(qualified + "\n" + INVOICE)
+
+    assert _values(rules)["Invoice Date"] == ("05.01.2024", "high")
+
+
+def test_generic_date_does_not_complete_the_rules():
+    rules = extract_invoice_fields(INVOICE.replace("Rechnungsdatum", "Datum"))
+
+    assert _values(rules)["Invoice Date"] == ("05.01.2024", "medium")
+    assert not rules_are_complete(rules)
+
+
+def test_llm_field_replaces_generic_rule_field():
+    rules = extract_invoice_fields("Datum: 03.01.2024\n")
+    merged = merge_extractions(rules, {"extracted_fields": [{"field_name": "Invoice Date", "value": "05.01.2024"}]})
+
+    assert [(field["value"], field["source"]) for field in merged["extracted_fields"]] == [("05.01.2024", "llm")]
@@ -0,0 +1,85 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import llm_clients
+from llm_clients import cached_prompt_messages, get_llm, get_prompt_cache_stats, record_prompt_cache_usage
+
+STATIC_PROMPT = "You are a document classification expert. " * 200
+DOCUMENT_TOKENS = 40
+
+
+class StubMessages(BaseHTTPRequestHandler):
+    """Messages endpoint that reports a cache write on the first call and cache reads afterwards"""
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.payloads.append(payload)
+        first = len(self.server.payloads) == 1
+        body = json.dumps({
+            "id": f"msg_{len(self.server.payloads)}",
+            "type": "message",
+            "role": "assistant",
+            "model": payload["model"],
+            "content": [{"type": "text", "text": "{'category': 'Finance', 'confidence': 0.9}"}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": DOCUMENT_TOKENS,
+                "output_tokens": 10,
+                "cache_creation_input_tokens": 1000 if first else 0,
+                "cache_read_input_tokens": 0 if first else 1000,
+            },
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubMessages)
+    server.payloads = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def clean_stats(monkeypatch):
+    monkeypatch.setattr(llm_clients, "PROMPT_CACHE_STATS", dict.fromkeys(llm_clients.PROMPT_CACHE_STATS, 0))
+
+
+def test_static_prompt_is_sent_as_cached_system_block(stub_server, clean_stats):
+    llm = get_llm(api_key="sk-test", anthropic_api_url=f"http://127.0.0.1:{stub_server.server_port}", max_retries=0)
+    llm.invoke(cached_prompt_messages(STATIC_PROMPT, "Document: invoice 1"))
+
+    system = stub_server.payloads[0]["system"]
+    assert system == [{"type": "text", "text": STATIC_PROMPT, "cache_control": {"type": "ephemeral"}}]
+    assert stub_server.payloads[0]["messages"] == [{"role": "user", "content": "Document: invoice 1"}]
+
+
+def test_cache_token_counters_accumulate_across_calls(stub_server, clean_stats):
+    llm = get_llm(api_key="sk-test", anthropic_api_url=f"http://127.0.0.1:{stub_server.server_port}", max_retries=0)
+    usages = [
+        record_prompt_cache_usage(llm.invoke(cached_prompt_messages(STATIC_PROMPT, f"Document: invoice {i}")))
+        for i in range(3)
+    ]
+
+    assert usages[0] == {"cache_read_input_tokens": 0, "cache_creation_input_tokens": 1000, "uncached_input_tokens": DOCUMENT_TOKENS}
+    assert usages[1]["cache_read_input_tokens"] == 1000
+    assert get_prompt_cache_stats() == {
+        "requests": 3,
+        "cache_read_input_tokens": 2000,
+        "cache_creation_input_tokens": 1000,
+        "uncached_input_tokens": 3 * DOCUMENT_TOKENS,
+    }
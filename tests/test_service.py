@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import fake_llm_server
+import service
+
+DOCUMENT = "Invoice RE-1001 from ACME GmbH. Net amount 100.00 EUR, VAT 19.00 EUR, total 119.00 EUR."
+CONCURRENT_REQUESTS = 10
+FAKE_LLM_DELAY = 0.5  # keeps the first upstream call open while concurrent requests arrive
+
+
+@pytest.fixture(scope="module")
+def fake_llm_url():
+    """
+    One fake_llm_server for the whole module, on its own event loop thread: the pages and
+    get_llm create their Claude clients once per process, so the upstream URL must not change
+    """
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(fake_llm_server.create_app(delay=FAKE_LLM_DELAY))
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = runner.addresses[0][1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{port}"
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+
+@pytest.fixture
+def headless(tmp_path, monkeypatch, fake_llm_url):
+    """No secrets.toml: the pages take the key from the environment, and their stores go to tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "sk-test")
+    monkeypatch.setenv("ANTHROPIC_API_URL", fake_llm_url)
+    return fake_llm_url
+
+
+async def _upstream_requests(fake_llm_url):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{fake_llm_url}/requests") as response:
+            return (await response.json())["requests"]
+
+
+async def _call_service(fake_llm_url, requests):
+    """
+    Send requests [(path, payload)] to the service concurrently and return their (status, body),
+    the service's /stats and how many upstream calls the fake server answered meanwhile
+    """
+    before = await _upstream_requests(fake_llm_url)
+    async with TestClient(TestServer(service.create_app())) as client:
+        responses = await asyncio.gather(*(client.post(path, json=payload) for path, payload in requests))
+        results = [(response.status, await response.json()) for response in responses]
+        stats = await (await client.get("/stats")).json()
+    return results, stats, await _upstream_requests(fake_llm_url) - before
+
+
+def test_concurrent_identical_requests_make_one_upstream_call(headless):
+    requests = [("/classify", {"text": DOCUMENT})] * CONCURRENT_REQUESTS
+    results, stats, upstream_calls = asyncio.run(_call_service(headless, requests))
+
+    assert [status for status, _ in results] == [200] * CONCURRENT_REQUESTS
+    assert all(body["category"] == "Finance" for _, body in results)
+    assert upstream_calls == 1
+    assert stats["service"]["coalesced"] == CONCURRENT_REQUESTS - 1
+
+
+def test_extract_without_secrets_file(headless):
+    requests = [("/extract", {"text": "Consulting services for ACME GmbH"})]
+    results, _, upstream_calls = asyncio.run(_call_service(headless, requests))
+
+    [(status, extraction)] = results
+    assert status == 200
+    assert {field["field_name"]: field["value"] for field in extraction["extracted_fields"]} == {"Invoice Number": "RE-1001"}
+    assert extraction["amounts"]["total_amount"] == "119.00"
+    assert extraction["validation_warnings"] == []
+    assert upstream_calls == 1  # the fake reply reconciles, so no re-check call
+
+
+def test_summarize_without_secrets_file(headless):
+    requests = [("/summarize", {"text": DOCUMENT, "style": "bullet", "max_words": 50})]
+    results, _, _ = asyncio.run(_call_service(headless, requests))
+
+    assert results == [(200, {"summary": "Summary of the document."})]
@@ -1,13 +1,16 @@
 import streamlit as st
-from langchain_anthropic import ChatAnthropic
+from llm_clients import get_llm
 import pandas as pd
-import PyPDF2
 import os
 import json
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
 from datetime import datetime
+from classification_cache import get_cached_classification, cache_classification
+from pdf_extraction import extract_text_with_budget
+from llm_json import LLMJSONError, classification_schema, parse_llm_json
+from correction_store import add_correction, find_similar_corrections
+from fast_path import classify_locally, get_fast_path_stats
+from embedding_cache import embed_text
+from shared_resources import get_embedding_model, prepare_corrections, warm_up_once, get_load_metrics
 
 # Load API keys securely
 ANTHROPIC_API_KEY = st.secrets.get("ANTHROPIC_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
@@ -16,21 +19,11 @@ if not ANTHROPIC_API_KEY:
     st.stop()
 
 # Paths & Configuration
-DB_FILE = "vector_index.faiss"
-CORRECTIONS_FILE = "corrections.json"
-EMBEDDING_MODEL = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-
-# FAISS Vector Index Setup
-vector_dim = 384  # MiniLM embedding dimension
-if os.path.exists(DB_FILE):
-    index = faiss.read_index(DB_FILE)
-else:
-    index = faiss.IndexFlatL2(vector_dim)
-
-correction_data = {}
-if os.path.exists(CORRECTIONS_FILE):
-    with open(CORRECTIONS_FILE, "r") as f:
-        correction_data = json.load(f)
+CORRECTIONS_FILE = "corrections.json"  # legacy store, imported once into the correction store
+MODEL_NAME = "claude-3-sonnet-20240229"
+PROMPT_VERSION = "vectorsort-v1"
+CLASSIFICATION_SCHEMA = classification_schema()
+MAX_TEXT_CHARS = 4000  # character budget for classification input
 
 # Categories
 CATEGORIES = {
@@ -54,9 +47,8 @@ CATEGORIES = {
 def extract_text_from_pdf(file):
     """Extracts text from a PDF document"""
     try:
-        pdf_reader = PyPDF2.PdfReader(file)
-        text = "\n".join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
-        return text[:4000] if text.strip() else None
+        text = extract_text_with_budget(file, MAX_TEXT_CHARS)
+        return text if text.strip() else None
     except Exception as e:
         st.error(f"❌ PDF Processing Error: {str(e)}")
         return None
@@ -64,26 +56,37 @@ def extract_text_from_pdf(file):
 # Get similar past corrections using FAISS
 def get_similar_past_correction(text):
     """Retrieves similar past corrections using FAISS vector search"""
-    text_embedding = EMBEDDING_MODEL.encode([text])[0].astype(np.float32).reshape(1, -1)
+    prepare_corrections(CORRECTIONS_FILE)
+    text_embedding = embed_text(text)
+    matches = find_similar_corrections(text_embedding, k=1)  # Retrieve 1 closest match
+    return matches[0]["category"] if matches else None
 
-    if index.ntotal > 0:
-        _, I = index.search(text_embedding, 1)  # Retrieve 1 closest match
-        matched_text = list(correction_data.keys())[I[0][0]]
-        return correction_data.get(matched_text, None)
-    return None
+# Store a user correction for future classifications
+def store_correction(text, category):
+    """Stores a user-confirmed category with the document embedding"""
+    prepare_corrections(CORRECTIONS_FILE)
+    add_correction(text, category, embed_text(text))  # cached when the document was classified
 
 # AI Classification using Claude with Learning
 def classify_document(text):
     """Uses Claude AI to classify a document, ensuring JSON response format with a formal summary."""
     try:
-        llm = ChatAnthropic(
-            model="claude-3-sonnet-20240229",
-            anthropic_api_key=ANTHROPIC_API_KEY
-        )
+        local = classify_locally(text, CATEGORIES)  # skips the LLM when the embedding match is clear
+        if local is not None:
+            return local
 
         past_correction = get_similar_past_correction(text)
         correction_context = f"Previous correction applied: {past_correction}" if past_correction else "No past corrections available."
 
+        cached = get_cached_classification(text, PROMPT_VERSION, MODEL_NAME, context=correction_context)
+        if cached is not None:
+            return cached
+
+        llm = get_llm(
+            model=MODEL_NAME,
+            api_key=ANTHROPIC_API_KEY
+        )
+
         prompt = f"""
         You are an AI-powered document classifier for enterprise use. Your task is to analyze and classify documents into the most relevant business category.
 
@@ -131,9 +134,10 @@ def classify_document(text):
             return None
 
         try:
-            classification_data = json.loads(response.content)
+            classification_data = parse_llm_json(llm, response.content, CLASSIFICATION_SCHEMA)
+            cache_classification(text, PROMPT_VERSION, MODEL_NAME, classification_data, context=correction_context)
             return classification_data
-        except json.JSONDecodeError as e:
+        except LLMJSONError as e:
             st.error(f"❌ JSON Parsing Error: {e}")
             return None
 
@@ -145,6 +149,8 @@ def classify_document(text):
 def main():
     st.set_page_config(page_title="📂 AI Document Classifier", layout="wide")
     st.title("🤖 ClassifAI ")
+    # Models and indexes load in the background while the page renders, once per process
+    warm_up_once("vectorsort", get_embedding_model, lambda: prepare_corrections(CORRECTIONS_FILE))
 
     uploaded_file = st.file_uploader("Upload a PDF document", type="pdf")
 
@@ -189,6 +195,14 @@ def main():
         st.write(f"🧠 **Sentiment Analysis:** {sentiment_analysis}")
         st.write(f"📂 **Archival Recommendation:** {archival_recommendation}")
 
+        fast_path_stats = get_fast_path_stats()
+        st.caption(f"⚡ Answered locally: {fast_path_stats['local']} of "
+                   f"{fast_path_stats['local'] + fast_path_stats['escalated']} documents since the app started (all sessions)")
+
+        load_metrics = get_load_metrics()
+        if load_metrics:
+            st.caption("⏱️ Loaded once per process: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in load_metrics.items()))
+
         # Confidence threshold check for human review
         if confidence < 85:
             st.warning("⚠️ **AI is uncertain! Human review recommended.**")